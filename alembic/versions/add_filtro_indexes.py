@@ -0,0 +1,34 @@
+"""add composite indexes for the licitaciones listing filters
+
+Revision ID: add_filtro_indexes
+Revises: add_sin_titulo_index
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_filtro_indexes'
+down_revision = 'add_sin_titulo_index'
+branch_labels = None
+depends_on = None
+
+# Filtro de igualdad + orden del listado (fecha_actualizacion DESC, id DESC)
+FILTRO_INDEXES = [
+    ('ix_licit_estado_fecha', 'estado'),
+    ('ix_licit_tipo_fecha', 'tipo_contrato'),
+]
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        for nombre, columna in FILTRO_INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} "
+                f"ON licitaciones ({columna}, fecha_actualizacion DESC, id DESC)"
+            )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for nombre, _ in FILTRO_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre}")
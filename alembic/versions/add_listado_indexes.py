@@ -0,0 +1,33 @@
+"""add ordering indexes for the licitaciones listing
+
+Revision ID: add_listado_indexes
+Revises: add_stats_snapshot
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_listado_indexes'
+down_revision = 'add_stats_snapshot'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        # ORDER BY fecha_actualizacion DESC, id DESC LIMIT n del listado
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_licit_fecha_desc "
+            "ON licitaciones (fecha_actualizacion DESC, id DESC)"
+        )
+        # Mismo orden restringido a solo_analizadas_ia=True
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_licit_analizado_fecha "
+            "ON licitaciones (fecha_actualizacion DESC, id DESC) WHERE analizado_ia = true"
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_licit_analizado_fecha")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_licit_fecha_desc")
@@ -0,0 +1,38 @@
+"""add generated tsvector column for full-text search
+
+Revision ID: add_search_tsv
+Revises: add_filtro_indexes
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_search_tsv'
+down_revision = 'add_filtro_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Columna generada con titulo, resumen y expediente (reescribe la tabla una vez)
+    op.execute("""
+        ALTER TABLE licitaciones
+        ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('spanish',
+                coalesce(titulo, '') || ' ' || coalesce(resumen, '') || ' ' || coalesce(expediente, ''))
+        ) STORED
+    """)
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_licit_search_tsv "
+            "ON licitaciones USING gin (search_tsv)"
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_licit_search_tsv")
+
+    op.execute("ALTER TABLE licitaciones DROP COLUMN IF EXISTS search_tsv")
@@ -0,0 +1,29 @@
+"""add covering partial index for licitaciones without titulo_adaptado
+
+Revision ID: add_sin_titulo_index
+Revises: codigos_cpv_jsonb
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_sin_titulo_index'
+down_revision = 'codigos_cpv_jsonb'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Índice parcial sobre las pendientes de título adaptado: las filas salen del
+    # índice al rellenarse, así que cada pasada recorre solo lo que queda.
+    # Solo se incluye titulo (resumen puede superar el tamaño máximo de fila de un B-tree)
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_licit_sin_titulo "
+            "ON licitaciones (id) INCLUDE (titulo) "
+            "WHERE titulo_adaptado IS NULL OR titulo_adaptado = ''"
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_licit_sin_titulo")
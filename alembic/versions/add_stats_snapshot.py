@@ -0,0 +1,34 @@
+"""add stats_snapshot table
+
+Revision ID: add_stats_snapshot
+Revises: add_trgm_indexes
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_stats_snapshot'
+down_revision = 'add_trgm_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Tabla con las estadísticas generales precalculadas
+    op.create_table('stats_snapshot',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('total_licitaciones', sa.Integer(), nullable=False),
+        sa.Column('total_presupuesto', sa.DECIMAL(precision=18, scale=2), nullable=True),
+        sa.Column('presupuesto_promedio', sa.DECIMAL(precision=18, scale=2), nullable=True),
+        sa.Column('licitaciones_por_estado', sa.JSON(), nullable=True),
+        sa.Column('licitaciones_por_tipo', sa.JSON(), nullable=True),
+        sa.Column('licitaciones_por_concepto', sa.JSON(), nullable=True),
+        sa.Column('top_tecnologias', sa.JSON(), nullable=True),
+        sa.Column('evolucion_mensual', sa.JSON(), nullable=True),
+        sa.Column('fecha_calculo', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+def downgrade():
+    op.drop_table('stats_snapshot')
@@ -0,0 +1,33 @@
+"""add tipo_contrato/presupuesto_base index and drop redundant estado index
+
+Revision ID: add_tipo_presupuesto_index
+Revises: licitaciones_toast_target
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_tipo_presupuesto_index'
+down_revision = 'licitaciones_toast_target'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # CREATE/DROP INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        # tipo_contrato = ? AND presupuesto_base BETWEEN ? AND ?
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_licit_tipo_presupuesto "
+            "ON licitaciones (tipo_contrato, presupuesto_base)"
+        )
+        # estado es prefijo de ix_licit_estado_fecha
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_licitaciones_estado")
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_licitaciones_estado "
+            "ON licitaciones (estado)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_licit_tipo_presupuesto")
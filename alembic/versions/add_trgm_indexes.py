@@ -0,0 +1,41 @@
+"""add pg_trgm GIN indexes for text search
+
+Revision ID: add_trgm_indexes
+Revises: add_titulo_adaptado
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_trgm_indexes'
+down_revision = 'add_titulo_adaptado'
+branch_labels = None
+depends_on = None
+
+# (nombre del índice, expresión indexada)
+TRGM_INDEXES = [
+    ('idx_licit_titulo_trgm', 'titulo'),
+    ('idx_licit_resumen_trgm', 'resumen'),
+    ('idx_licit_expediente_trgm', 'expediente'),
+    ('idx_licit_lugar_ejecucion_trgm', 'lugar_ejecucion'),
+    ('idx_licit_conceptos_tic_trgm', '(conceptos_tic::text)'),
+    ('idx_licit_stack_tecnologico_trgm', '(stack_tecnologico::text)'),
+]
+
+def upgrade():
+    # Extensión de trigramas para acelerar ILIKE '%...%'
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        for nombre, expresion in TRGM_INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} "
+                f"ON licitaciones USING gin ({expresion} gin_trgm_ops)"
+            )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for nombre, _ in TRGM_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre}")
@@ -0,0 +1,33 @@
+"""convert AI analysis columns to jsonb
+
+Revision ID: analisis_ia_jsonb
+Revises: hash_contenido_bytea
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'analisis_ia_jsonb'
+down_revision = 'hash_contenido_bytea'
+branch_labels = None
+depends_on = None
+
+COLUMNAS = ['conceptos_tic', 'stack_tecnologico', 'resumen_tecnico']
+
+def upgrade():
+    # Los análisis se guardaban como string JSON (json.dumps del resultado):
+    # se desenvuelven para almacenar el array/objeto real
+    for columna in COLUMNAS:
+        op.execute(f"""
+            ALTER TABLE licitaciones
+            ALTER COLUMN {columna} TYPE jsonb
+            USING CASE
+                WHEN json_typeof({columna}) = 'string' THEN ({columna} #>> '{{}}')::jsonb
+                ELSE {columna}::jsonb
+            END
+        """)
+
+def downgrade():
+    for columna in COLUMNAS:
+        op.execute(f"ALTER TABLE licitaciones ALTER COLUMN {columna} TYPE json USING {columna}::json")
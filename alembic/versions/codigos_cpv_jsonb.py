@@ -0,0 +1,39 @@
+"""convert codigos_cpv to jsonb with GIN index
+
+Revision ID: codigos_cpv_jsonb
+Revises: add_listado_indexes
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'codigos_cpv_jsonb'
+down_revision = 'add_listado_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Los valores antiguos se guardaban como string JSON (json.dumps de la lista):
+    # se desenvuelven para almacenar el array real
+    op.execute("""
+        ALTER TABLE licitaciones
+        ALTER COLUMN codigos_cpv TYPE jsonb
+        USING CASE
+            WHEN json_typeof(codigos_cpv) = 'string' THEN (codigos_cpv #>> '{}')::jsonb
+            ELSE codigos_cpv::jsonb
+        END
+    """)
+
+    # Índice GIN para consultas de contención (codigos_cpv @> '["72000000"]')
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_licit_cpv_gin "
+            "ON licitaciones USING gin (codigos_cpv jsonb_path_ops)"
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_licit_cpv_gin")
+
+    op.execute("ALTER TABLE licitaciones ALTER COLUMN codigos_cpv TYPE json USING codigos_cpv::json")
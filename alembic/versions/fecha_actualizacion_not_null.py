@@ -0,0 +1,27 @@
+"""make licitaciones.fecha_actualizacion NOT NULL
+
+Revision ID: fecha_actualizacion_not_null
+Revises: analisis_ia_jsonb
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'fecha_actualizacion_not_null'
+down_revision = 'analisis_ia_jsonb'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # La paginación por cursor compara (fecha_actualizacion, id): una fecha NULL
+    # se saltaría en la comparación y rompería el cursor
+    op.execute("""
+        UPDATE licitaciones
+        SET fecha_actualizacion = COALESCE(created_at, now())
+        WHERE fecha_actualizacion IS NULL
+    """)
+    op.execute("ALTER TABLE licitaciones ALTER COLUMN fecha_actualizacion SET NOT NULL")
+
+def downgrade():
+    op.execute("ALTER TABLE licitaciones ALTER COLUMN fecha_actualizacion DROP NOT NULL")
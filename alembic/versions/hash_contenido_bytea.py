@@ -0,0 +1,29 @@
+"""store hash_contenido as raw bytea instead of hex text
+
+Revision ID: hash_contenido_bytea
+Revises: add_tipo_presupuesto_index
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'hash_contenido_bytea'
+down_revision = 'add_tipo_presupuesto_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # SHA-256 en 32 bytes en lugar de 64 caracteres hex (índice único la mitad de grande)
+    op.execute("""
+        ALTER TABLE licitaciones
+        ALTER COLUMN hash_contenido TYPE bytea
+        USING decode(hash_contenido, 'hex')
+    """)
+
+def downgrade():
+    op.execute("""
+        ALTER TABLE licitaciones
+        ALTER COLUMN hash_contenido TYPE varchar(64)
+        USING encode(hash_contenido, 'hex')
+    """)
@@ -0,0 +1,24 @@
+"""lower toast_tuple_target on licitaciones to keep heap rows narrow
+
+Revision ID: licitaciones_toast_target
+Revises: add_search_tsv
+Create Date: 2025-10-22
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'licitaciones_toast_target'
+down_revision = 'add_search_tsv'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Por defecto PostgreSQL solo saca textos a TOAST cuando la fila supera ~2KB, así
+    # que resumen, search_tsv y los JSON quedan dentro del heap y ensanchan cada fila
+    # que lee el listado. Con 512 bytes se comprimen/mueven antes (filas nuevas o
+    # actualizadas). Se mantiene STORAGE EXTENDED: EXTERNAL solo quitaría la compresión.
+    op.execute("ALTER TABLE licitaciones SET (toast_tuple_target = 512)")
+
+def downgrade():
+    op.execute("ALTER TABLE licitaciones RESET (toast_tuple_target)")
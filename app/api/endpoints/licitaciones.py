@@ -1,10 +1,14 @@
 """
 Endpoints de la API para Licitaciones
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app.core.database import get_db, get_async_db
+from app.core.cache import get_async_redis, clave_licitacion_detalle
+from app.core.config import settings
 from app.models.licitacion import Licitacion
+from app.services.estadisticas_service import EstadisticasService
 from app.schemas.licitacion_schema import (
     LicitacionListResponse,
     LicitacionListItem,
@@ -12,20 +16,82 @@ from app.schemas.licitacion_schema import (
     LicitacionFilters,
     EstadisticasResponse
 )
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from pydantic import TypeAdapter
+import base64
+import hashlib
 import json
 import logging
-from sqlalchemy import func, or_, and_, extract
-from datetime import datetime, timedelta
+from sqlalchemy import func, or_, cast, select, Text, text, tuple_
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Solo las columnas que muestra LicitacionListItem (evita traer resumen, stack, etc.)
+_COLUMNAS_LISTADO = [getattr(Licitacion, campo) for campo in LicitacionListItem.model_fields]
+
+# Validador de la página completa (una sola llamada al core de Pydantic por request)
+_ITEMS_LISTADO = TypeAdapter(List[LicitacionListItem])
+
+
+def _encode_cursor(licitacion) -> str:
+    """Codifica (fecha_actualizacion, id) de la última fila como cursor opaco"""
+    # fecha_actualizacion es NOT NULL: el cursor siempre se puede decodificar
+    fecha = licitacion.fecha_actualizacion.isoformat()
+    return base64.urlsafe_b64encode(f"{fecha}|{licitacion.id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decodifica un cursor generado por _encode_cursor"""
+    try:
+        fecha, licitacion_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(fecha), int(licitacion_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+async def _contar_cacheado(db: AsyncSession, condiciones: list, filtros: dict) -> int:
+    """COUNT(*) de las condiciones cacheado en Redis según la firma de los filtros"""
+    firma = hashlib.sha1(json.dumps(filtros, sort_keys=True, default=str).encode()).hexdigest()
+    cache_key = f"licitaciones:count:{firma}"
+    
+    redis_client = get_async_redis()
+    if redis_client is not None:
+        try:
+            cached = await redis_client.get(cache_key)
+            if cached is not None:
+                return int(cached)
+        except Exception as e:
+            logger.warning(f"Error leyendo total cacheado de Redis: {e}")
+    
+    total = (await db.execute(
+        select(func.count()).select_from(Licitacion).where(*condiciones)
+    )).scalar_one()
+    
+    if redis_client is not None:
+        try:
+            await redis_client.setex(cache_key, settings.CACHE_TTL_SECONDS, total)
+        except Exception as e:
+            logger.warning(f"Error guardando total en Redis: {e}")
+    
+    return total
+
+
+async def _total_estimado(db: AsyncSession) -> Optional[int]:
+    """Número aproximado de filas de licitaciones según las estadísticas de PostgreSQL"""
+    estimado = (await db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'licitaciones'")
+    )).scalar()
+    # reltuples vale -1 si la tabla nunca se ha analizado
+    return int(estimado) if estimado is not None and estimado >= 0 else None
+
 
 @router.get("/", response_model=LicitacionListResponse)
-def list_licitaciones(
-    page: int = Query(1, ge=1, description="Número de página"),
+async def list_licitaciones(
+    page: int = Query(1, ge=1, description="Número de página (paginación por offset, lenta en páginas profundas)"),
+    cursor: Optional[str] = Query(None, description="Cursor de paginación devuelto como next_cursor"),
     page_size: int = Query(20, ge=1, le=100, description="Tamaño de página"),
     search: Optional[str] = Query(None, description="Búsqueda en título y descripción"),
     estado: Optional[str] = Query(None, description="Estado de la licitación"),
@@ -35,108 +101,197 @@ def list_licitaciones(
     lugar_ejecucion: Optional[str] = Query(None, description="Lugar de ejecución"),
     concepto_tic: Optional[str] = Query(None, description="Concepto TIC"),
     tecnologia: Optional[str] = Query(None, description="Tecnología específica"),
+    cpv: Optional[str] = Query(None, description="Código CPV exacto (p.ej. 72000000)"),
     fecha_desde: Optional[datetime] = Query(None, description="Fecha desde"),
     fecha_hasta: Optional[datetime] = Query(None, description="Fecha hasta"),
     solo_analizadas_ia: bool = Query(False, description="Solo licitaciones analizadas con IA"),
-    db: Session = Depends(get_db)
+    exact_total: bool = Query(False, description="Calcular el total exacto (COUNT cacheado en Redis)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Lista licitaciones con filtros y paginación
+    
+    Con `cursor` se usa paginación por clave (fecha_actualizacion, id), de coste
+    constante sea cual sea la profundidad; en ese modo no se calcula el total.
+    
+    Sin `exact_total` no se ejecuta COUNT(*): sin filtros se devuelve la
+    estimación de pg_class y con filtros `total` es null (usar `next_cursor`).
+    
+    `search` admite la sintaxis de websearch_to_tsquery ("frase exacta", -excluir, OR)
+    y, en paginación por offset, los resultados se ordenan por relevancia.
     """
-    # Construir query base
-    query = db.query(Licitacion)
+    filtros = {
+        "search": search, "estado": estado, "tipo_contrato": tipo_contrato,
+        "presupuesto_min": presupuesto_min, "presupuesto_max": presupuesto_max,
+        "lugar_ejecucion": lugar_ejecucion, "concepto_tic": concepto_tic,
+        "tecnologia": tecnologia, "cpv": cpv, "fecha_desde": fecha_desde, "fecha_hasta": fecha_hasta,
+        "solo_analizadas_ia": solo_analizadas_ia,
+    }
+    
+    # Construir condiciones
+    # Los valores van como parámetros: SQLAlchemy cachea el SQL compilado por cada
+    # combinación de filtros (query_cache_size), así que no se recompila por request
+    condiciones = []
     
     # Aplicar filtros
+    consulta_tsv = None
     if search:
+        # Texto completo sobre search_tsv (titulo + resumen + expediente, índice GIN)
+        consulta_tsv = func.websearch_to_tsquery("spanish", search)
         search_filter = or_(
-            Licitacion.titulo.ilike(f"%{search}%"),
-            Licitacion.resumen.ilike(f"%{search}%"),
+            Licitacion.search_tsv.op("@@")(consulta_tsv),
+            # Fragmentos de códigos de expediente que el parser de texto no separa
             Licitacion.expediente.ilike(f"%{search}%")
         )
-        query = query.filter(search_filter)
+        condiciones.append(search_filter)
     
     if estado:
-        query = query.filter(Licitacion.estado == estado)
+        condiciones.append(Licitacion.estado == estado)
     
     if tipo_contrato:
-        query = query.filter(Licitacion.tipo_contrato == tipo_contrato)
+        condiciones.append(Licitacion.tipo_contrato == tipo_contrato)
     
     if presupuesto_min is not None:
-        query = query.filter(Licitacion.presupuesto_base >= presupuesto_min)
+        condiciones.append(Licitacion.presupuesto_base >= presupuesto_min)
     
     if presupuesto_max is not None:
-        query = query.filter(Licitacion.presupuesto_base <= presupuesto_max)
+        condiciones.append(Licitacion.presupuesto_base <= presupuesto_max)
     
     if lugar_ejecucion:
-        query = query.filter(Licitacion.lugar_ejecucion.ilike(f"%{lugar_ejecucion}%"))
+        condiciones.append(Licitacion.lugar_ejecucion.ilike(f"%{lugar_ejecucion}%"))
     
     if concepto_tic:
-        query = query.filter(Licitacion.conceptos_tic.ilike(f"%{concepto_tic}%"))
+        # Cast a texto para que coincida con el índice de trigramas sobre conceptos_tic::text
+        condiciones.append(cast(Licitacion.conceptos_tic, Text).ilike(f"%{concepto_tic}%"))
     
     if tecnologia:
-        query = query.filter(Licitacion.stack_tecnologico.ilike(f"%{tecnologia}%"))
+        condiciones.append(cast(Licitacion.stack_tecnologico, Text).ilike(f"%{tecnologia}%"))
+    
+    if cpv:
+        # codigos_cpv @> '["<cpv>"]' (usa idx_licit_cpv_gin)
+        condiciones.append(Licitacion.codigos_cpv.contains([cpv]))
     
     if fecha_desde:
-        query = query.filter(Licitacion.fecha_actualizacion >= fecha_desde)
+        condiciones.append(Licitacion.fecha_actualizacion >= fecha_desde)
     
     if fecha_hasta:
-        query = query.filter(Licitacion.fecha_actualizacion <= fecha_hasta)
+        condiciones.append(Licitacion.fecha_actualizacion <= fecha_hasta)
     
     if solo_analizadas_ia:
-        query = query.filter(Licitacion.analizado_ia == True)
-    
-    # Contar total
-    total = query.count()
-    
-    # Calcular paginación
-    total_pages = (total + page_size - 1) // page_size
-    skip = (page - 1) * page_size
-    
-    # Obtener resultados
-    licitaciones = query.order_by(Licitacion.fecha_actualizacion.desc()).offset(skip).limit(page_size).all()
-    
-    # Convertir a schema
-    items = []
-    for lic in licitaciones:
-        item = LicitacionListItem.model_validate(lic)
+        condiciones.append(Licitacion.analizado_ia == True)
+    
+    orden = (Licitacion.fecha_actualizacion.desc(), Licitacion.id.desc())
+    # Con búsqueda (y sin cursor) se ordena por relevancia
+    ordenar_por_relevancia = consulta_tsv is not None and not cursor
+    
+    if cursor:
+        # Paginación por clave: sin OFFSET ni COUNT(*)
+        cursor_fecha, cursor_id = _decode_cursor(cursor)
+        stmt = (
+            select(*_COLUMNAS_LISTADO)
+            .where(
+                *condiciones,
+                tuple_(Licitacion.fecha_actualizacion, Licitacion.id) < tuple_(cursor_fecha, cursor_id)
+            )
+            .order_by(*orden)
+            .limit(page_size + 1)
+        )
+        
+        filas = (await db.execute(stmt)).all()
+        licitaciones = filas[:page_size]
+        has_more = len(filas) > page_size
+        
+        total = None
+        total_pages = None
+    else:
+        skip = (page - 1) * page_size
+        
+        # Obtener resultados (una fila extra para saber si hay más páginas)
+        # id como desempate para un orden estable (usa ix_licit_fecha_desc)
+        if ordenar_por_relevancia:
+            orden = (func.ts_rank_cd(Licitacion.search_tsv, consulta_tsv).desc(),) + orden
+        
+        stmt = (
+            select(*_COLUMNAS_LISTADO)
+            .where(*condiciones)
+            .order_by(*orden)
+            .offset(skip)
+            .limit(page_size + 1)
+        )
+        filas = (await db.execute(stmt)).all()
+        licitaciones = filas[:page_size]
+        has_more = len(filas) > page_size
         
-        # Parsear conceptos TIC si existen
-        if lic.conceptos_tic:
-            # SQLAlchemy ya devuelve el JSON parseado
-            item.conceptos_tic = lic.conceptos_tic if isinstance(lic.conceptos_tic, list) else []
+        if exact_total:
+            total = await _contar_cacheado(db, condiciones, filtros)
+        elif all(valor is None or valor is False or valor == "" for valor in filtros.values()):
+            total = await _total_estimado(db)
+        else:
+            total = None
         
-        items.append(item)
+        # Calcular paginación
+        total_pages = (total + page_size - 1) // page_size if total is not None else None
+    
+    # El cursor codifica (fecha_actualizacion, id): no aplica al orden por relevancia
+    next_cursor = (
+        _encode_cursor(licitaciones[-1])
+        if has_more and licitaciones and not ordenar_por_relevancia
+        else None
+    )
+    
+    # Convertir a schema
+    filas = [dict(fila._mapping) for fila in licitaciones]
+    for datos in filas:
+        # conceptos_tic es JSONB; cualquier valor que no sea una lista se descarta
+        if datos["conceptos_tic"] and not isinstance(datos["conceptos_tic"], list):
+            datos["conceptos_tic"] = []
+    
+    items = _ITEMS_LISTADO.validate_python(filas)
     
     return LicitacionListResponse(
         total=total,
         page=page,
         page_size=page_size,
         total_pages=total_pages,
+        next_cursor=next_cursor,
         items=items
     )
 
 
 @router.get("/{licitacion_id}", response_model=LicitacionDetail)
-def get_licitacion(
+async def get_licitacion(
     licitacion_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtiene el detalle completo de una licitación
+    
+    La respuesta serializada se cachea en Redis durante CACHE_TTL_SECONDS y se
+    invalida cuando la licitación se actualiza.
     """
-    licitacion = db.query(Licitacion).filter(Licitacion.id == licitacion_id).first()
+    cache_key = clave_licitacion_detalle(licitacion_id)
+    redis_client = get_async_redis()
+    
+    if redis_client is not None:
+        try:
+            cached = await redis_client.get(cache_key)
+            if cached is not None:
+                return Response(content=cached, media_type="application/json")
+        except Exception as e:
+            logger.warning(f"Error leyendo detalle cacheado de Redis: {e}")
+    
+    # Los documentos se cargan en la misma ida: con AsyncSession no hay lazy loading
+    licitacion = (await db.execute(
+        select(Licitacion)
+        .options(selectinload(Licitacion.documentos))
+        .where(Licitacion.id == licitacion_id)
+    )).scalar_one_or_none()
     
     if not licitacion:
         raise HTTPException(status_code=404, detail="Licitación no encontrada")
     
     # Parsear campos antes de la validación de Pydantic
-    # Convertir codigos_cpv de string a lista
-    if licitacion.codigos_cpv and isinstance(licitacion.codigos_cpv, str):
-        try:
-            licitacion.codigos_cpv = json.loads(licitacion.codigos_cpv)
-        except:
-            licitacion.codigos_cpv = []
-    
+    # (codigos_cpv es JSONB y llega ya como lista)
     # Convertir duracion de int a string
     if licitacion.duracion and isinstance(licitacion.duracion, int):
         licitacion.duracion = str(licitacion.duracion)
@@ -144,6 +299,12 @@ def get_licitacion(
     # Convertir a schema
     detail = LicitacionDetail.model_validate(licitacion)
     
+    if redis_client is not None:
+        try:
+            await redis_client.setex(cache_key, settings.CACHE_TTL_SECONDS, detail.model_dump_json())
+        except Exception as e:
+            logger.warning(f"Error guardando detalle en Redis: {e}")
+    
     return detail
 
 
@@ -155,109 +316,16 @@ def get_estadisticas(
 ):
     """
     Obtiene estadísticas generales de licitaciones
-    """
-    # Query base
-    query = db.query(Licitacion)
-    
-    # Aplicar filtros de fecha
-    if fecha_desde:
-        query = query.filter(Licitacion.fecha_actualizacion >= fecha_desde)
     
-    if fecha_hasta:
-        query = query.filter(Licitacion.fecha_actualizacion <= fecha_hasta)
-    
-    # Total de licitaciones
-    total_licitaciones = query.count()
-    
-    # Total y promedio de presupuesto
-    presupuesto_stats = query.with_entities(
-        func.sum(Licitacion.presupuesto_base),
-        func.avg(Licitacion.presupuesto_base)
-    ).filter(Licitacion.presupuesto_base.isnot(None)).first()
-    
-    total_presupuesto = float(presupuesto_stats[0] or 0)
-    presupuesto_promedio = float(presupuesto_stats[1] or 0)
-    
-    # Licitaciones por estado
-    licitaciones_por_estado = {}
-    estados = query.with_entities(
-        Licitacion.estado,
-        func.count(Licitacion.id)
-    ).filter(Licitacion.estado.isnot(None)).group_by(Licitacion.estado).all()
-    
-    for estado, count in estados:
-        licitaciones_por_estado[estado] = count
-    
-    # Licitaciones por tipo
-    licitaciones_por_tipo = {}
-    tipos = query.with_entities(
-        Licitacion.tipo_contrato,
-        func.count(Licitacion.id)
-    ).filter(Licitacion.tipo_contrato.isnot(None)).group_by(Licitacion.tipo_contrato).all()
-    
-    for tipo, count in tipos:
-        licitaciones_por_tipo[tipo] = count
+    Se mantiene síncrono (FastAPI lo ejecuta en el threadpool): EstadisticasService
+    se comparte con la tarea de Celery que refresca el snapshot.
+    """
+    estadisticas_service = EstadisticasService(db)
     
-    # Licitaciones por concepto (requiere parsear JSON)
-    licitaciones_por_concepto = {}
-    conceptos_lics = query.filter(Licitacion.conceptos_tic.isnot(None)).all()
+    # Sin filtros de fecha se sirve el snapshot precalculado por Celery
+    if fecha_desde is None and fecha_hasta is None:
+        estadisticas = estadisticas_service.obtener_snapshot()
+    else:
+        estadisticas = estadisticas_service.calcular(fecha_desde, fecha_hasta)
     
-    for lic in conceptos_lics:
-        try:
-            # SQLAlchemy ya devuelve el JSON parseado
-            conceptos = lic.conceptos_tic if isinstance(lic.conceptos_tic, list) else []
-            for concepto in conceptos:
-                licitaciones_por_concepto[concepto] = licitaciones_por_concepto.get(concepto, 0) + 1
-        except:
-            pass
-    
-    # Top tecnologías
-    top_tecnologias = []
-    tecnologias_count = {}
-    stack_lics = query.filter(Licitacion.stack_tecnologico.isnot(None)).all()
-    
-    for lic in stack_lics:
-        try:
-            # SQLAlchemy ya devuelve el JSON parseado
-            stack = lic.stack_tecnologico if isinstance(lic.stack_tecnologico, dict) else {}
-            for categoria, tecnologias in stack.items():
-                for tech in tecnologias:
-                    tecnologias_count[tech] = tecnologias_count.get(tech, 0) + 1
-        except:
-            pass
-    
-    # Ordenar y tomar top 10
-    top_tecnologias = [
-        {"nombre": tech, "count": count}
-        for tech, count in sorted(tecnologias_count.items(), key=lambda x: x[1], reverse=True)[:10]
-    ]
-    
-    # Evolución mensual (últimos 12 meses)
-    evolucion_mensual = []
-    for i in range(12, 0, -1):
-        mes_inicio = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(days=30*i)
-        mes_fin = mes_inicio + timedelta(days=30)
-        
-        count = db.query(Licitacion).filter(
-            and_(
-                Licitacion.fecha_actualizacion >= mes_inicio,
-                Licitacion.fecha_actualizacion < mes_fin
-            )
-        ).count()
-        
-        evolucion_mensual.append({
-            "mes": mes_inicio.strftime("%Y-%m"),
-            "count": count
-        })
-    
-    return EstadisticasResponse(
-        total_licitaciones=total_licitaciones,
-        total_presupuesto=total_presupuesto,
-        presupuesto_promedio=presupuesto_promedio,
-        licitaciones_por_estado=licitaciones_por_estado,
-        licitaciones_por_tipo=licitaciones_por_tipo,
-        licitaciones_por_concepto=licitaciones_por_concepto,
-        top_tecnologias=top_tecnologias,
-        evolucion_mensual=evolucion_mensual
-    )
-
+    return EstadisticasResponse(**estadisticas)
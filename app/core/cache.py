@@ -0,0 +1,75 @@
+"""
+Cliente de Redis compartido para cachés de la aplicación.
+"""
+from typing import Optional
+import logging
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Variables globales para lazy initialization
+_redis_client = None
+_async_redis_client = None
+
+def get_redis() -> Optional[redis.Redis]:
+    """
+    Obtener cliente de Redis (lazy initialization).
+    
+    Devuelve None si Redis no está disponible, para que las cachés
+    degraden a consultar directamente la fuente original.
+    """
+    global _redis_client
+    if _redis_client is None:
+        try:
+            _redis_client = redis.Redis.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                socket_timeout=1,
+                socket_connect_timeout=1,
+            )
+        except Exception as e:
+            logger.warning(f"No se pudo inicializar Redis: {e}")
+            return None
+    return _redis_client
+
+def get_async_redis() -> Optional[aioredis.Redis]:
+    """
+    Obtener cliente asíncrono de Redis para endpoints async (lazy initialization).
+    
+    Igual que get_redis, devuelve None si Redis no está disponible.
+    """
+    global _async_redis_client
+    if _async_redis_client is None:
+        try:
+            _async_redis_client = aioredis.Redis.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                socket_timeout=1,
+                socket_connect_timeout=1,
+            )
+        except Exception as e:
+            logger.warning(f"No se pudo inicializar Redis async: {e}")
+            return None
+    return _async_redis_client
+
+
+# Caché del detalle de licitaciones (GET /licitaciones/{id})
+LICITACION_DETALLE_NAMESPACE = "licitacion_detail"
+
+def clave_licitacion_detalle(licitacion_id: int) -> str:
+    """Clave de Redis del detalle serializado de una licitación."""
+    return f"{LICITACION_DETALLE_NAMESPACE}:{licitacion_id}"
+
+def invalidar_licitacion_detalle(*licitacion_ids: int) -> None:
+    """Elimina de la caché el detalle de las licitaciones indicadas."""
+    if not licitacion_ids:
+        return
+    redis_client = get_redis()
+    if redis_client is None:
+        return
+    try:
+        redis_client.delete(*(clave_licitacion_detalle(i) for i in licitacion_ids))
+    except Exception as e:
+        logger.warning(f"Error invalidando caché de licitaciones: {e}")
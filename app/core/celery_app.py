@@ -14,6 +14,7 @@ celery_app = Celery(
         "app.tasks.scraping_tasks",
         "app.tasks.processing_tasks",
         "app.tasks.ai_tasks",
+        "app.tasks.stats_tasks",
     ]
 )
 
@@ -69,6 +70,18 @@ celery_app.conf.beat_schedule = {
         'kwargs': {'limit': 10}  # Reducido de 20 a 10 por ejecución
     },
     
+    # Recogida de los batches de IA terminados (solo con OPENAI_USE_BATCH_API)
+    'collect-ai-batches': {
+        'task': 'app.tasks.ai_tasks.collect_ai_batches',
+        'schedule': crontab(minute='*/15'),
+    },
+    
+    # Refresco del snapshot de estadísticas (cada 15 minutos)
+    'refresh-stats-snapshot': {
+        'task': 'app.tasks.stats_tasks.refresh_stats_snapshot',
+        'schedule': crontab(minute='*/15'),
+    },
+    
     # Limpieza de licitaciones antiguas (diario a las 4:00 AM)
     'cleanup-old-licitaciones': {
         'task': 'app.tasks.scraping_tasks.cleanup_old_licitaciones',
@@ -82,6 +95,7 @@ celery_app.conf.task_routes = {
     'app.tasks.scraping_tasks.*': {'queue': 'scraping'},
     'app.tasks.processing_tasks.*': {'queue': 'processing'},
     'app.tasks.ai_tasks.*': {'queue': 'ai'},
+    'app.tasks.stats_tasks.*': {'queue': 'processing'},
 }
 
 # Configuración de prioridades
@@ -16,8 +16,14 @@ class Settings(BaseSettings):
     
     # Base de datos
     DATABASE_URL: str
-    DATABASE_POOL_SIZE: int = 20
-    DATABASE_MAX_OVERFLOW: int = 40
+    # Por proceso (API síncrona, API async y cada worker de Celery tienen su pool):
+    # mantener bajo para no agotar las conexiones de Supabase
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 5
+    # Ejecuciones tras las que psycopg3 prepara una query en el servidor. None (por defecto)
+    # los desactiva: el pooler de Supabase en modo transacción (Supavisor/pgbouncer) falla
+    # con "prepared statement ... does not exist". Activar (ej: 3) solo con conexión directa
+    DATABASE_PREPARE_THRESHOLD: Optional[int] = None
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -30,8 +36,14 @@ class Settings(BaseSettings):
     # OpenAI (Fase 1: Validación - Optimización de costes)
     OPENAI_API_KEY: str
     OPENAI_MODEL: str = "gpt-4o-mini"  # 85% más barato: $0.150/1M input, $0.600/1M output
+    OPENAI_MODEL_SMALL: Optional[str] = None  # Título adaptado y conceptos (ej: "gpt-4.1-nano"); por defecto OPENAI_MODEL
+    OPENAI_MODEL_LARGE: Optional[str] = None  # Stack y resumen sobre el pliego; por defecto OPENAI_MODEL
     OPENAI_TEMPERATURE: float = 0.3
     OPENAI_MAX_TOKENS: int = 4000  # Reducido para ahorrar costes
+    OPENAI_MAX_RPM: int = 500  # Límite de peticiones por minuto de la cuenta
+    OPENAI_MAX_RETRIES: int = 5  # Reintentos con backoff ante 429 / 5xx
+    OPENAI_USE_BATCH_API: bool = False  # Análisis en segundo plano vía Batch API (50% más barato, hasta 24h)
+    OPENAI_BATCH_MAX_WAIT_HOURS: int = 24  # Antigüedad máxima de un batch sin terminar antes de cancelarlo
     
     # Optimización de costes - Análisis selectivo
     MIN_BUDGET_FOR_AI_ANALYSIS: int = 50000  # Solo analizar licitaciones >€50k con IA
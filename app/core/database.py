@@ -2,35 +2,52 @@
 Configuración de base de datos con SQLAlchemy.
 """
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
 from app.core.config import settings
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 # Variables globales para lazy initialization
 _engine = None
 _SessionLocal = None
+_async_engine = None
+_AsyncSessionLocal = None
 
 # Base para modelos
 Base = declarative_base()
 
+def _database_url() -> str:
+    """URL de la BD con el driver psycopg3 (válido para el engine síncrono y el async)."""
+    # Convertir URL de postgresql:// a postgresql+psycopg:// para psycopg3
+    db_url = settings.DATABASE_URL
+    if db_url.startswith('postgresql://'):
+        db_url = db_url.replace('postgresql://', 'postgresql+psycopg://', 1)
+    return db_url
+
+def _engine_options() -> dict:
+    """Opciones comunes del engine síncrono y del async."""
+    return dict(
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_recycle=1800,   # Reciclar conexiones cada 30 min
+        pool_pre_ping=True,  # Verificar conexiones antes de usarlas
+        query_cache_size=1200,  # Caché de SQL compilado de SQLAlchemy (500 por defecto)
+        connect_args={
+            # Prepared statements en servidor de psycopg3 (None los desactiva): solo con
+            # conexión directa, el pooler en modo transacción de Supabase no los soporta
+            "prepare_threshold": settings.DATABASE_PREPARE_THRESHOLD,
+            # El JIT de PostgreSQL solo añade latencia en queries OLTP cortas
+            "options": "-c jit=off",
+        },
+        echo=False,  # Cambiar a True para debug de queries
+    )
+
 def get_engine():
     """Obtener engine de SQLAlchemy (lazy initialization)."""
     global _engine
     if _engine is None:
-        # Convertir URL de postgresql:// a postgresql+psycopg:// para psycopg3
-        db_url = settings.DATABASE_URL
-        if db_url.startswith('postgresql://'):
-            db_url = db_url.replace('postgresql://', 'postgresql+psycopg://', 1)
-        
-        _engine = create_engine(
-            db_url,
-            poolclass=NullPool,  # O reducir pool_size de 10 a 3-5
-            pool_recycle=300,    # Reciclar conexiones cada 5 min
-            pool_pre_ping=True,  # Verificar conexiones antes de usarlas
-            echo=False,  # Cambiar a True para debug de queries
-        )
+        _engine = create_engine(_database_url(), **_engine_options())
     return _engine
 
 def get_session_local():
@@ -53,3 +70,36 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+
+
+def get_async_engine():
+    """
+    Obtener engine asíncrono de SQLAlchemy (lazy initialization).
+    
+    Usa el modo async de psycopg3 (mismo driver que el engine síncrono).
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(_database_url(), **_engine_options())
+    return _async_engine
+
+def get_async_session_local():
+    """Obtener AsyncSessionLocal (lazy initialization)."""
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(),
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return _AsyncSessionLocal
+
+# Dependency para endpoints async de solo lectura
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency que proporciona una sesión asíncrona de base de datos.
+    Se cierra automáticamente al finalizar la request.
+    """
+    AsyncSessionLocal = get_async_session_local()
+    async with AsyncSessionLocal() as db:
+        yield db
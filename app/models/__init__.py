@@ -10,6 +10,7 @@ from app.models.licitacion import (
     ResumenIA,
     Adjudicacion,
     ScrapingLog,
+    EstadisticasSnapshot,
     licitaciones_tecnologias,
     licitaciones_conceptos,
 )
@@ -23,6 +24,7 @@ __all__ = [
     "ResumenIA",
     "Adjudicacion",
     "ScrapingLog",
+    "EstadisticasSnapshot",
     "licitaciones_tecnologias",
     "licitaciones_conceptos",
 ]
@@ -1,8 +1,9 @@
 """
 Modelos de base de datos para licitaciones.
 """
-from sqlalchemy import Column, Integer, String, Text, DECIMAL, TIMESTAMP, Boolean, ForeignKey, Table, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, Integer, String, Text, DECIMAL, TIMESTAMP, Boolean, ForeignKey, Table, JSON, Index, LargeBinary, cast, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -37,7 +38,7 @@ class Licitacion(Base):
     titulo = Column(Text, nullable=False)
     titulo_adaptado = Column(Text, nullable=True)  # Título generado por IA más natural y conciso
     expediente = Column(String(100), nullable=True)
-    estado = Column(String(50), nullable=True, index=True)
+    estado = Column(String(50), nullable=True)  # Indexado en ix_licit_estado_fecha
     resumen = Column(Text, nullable=True)
     
     # Información del órgano de contratación
@@ -60,7 +61,7 @@ class Licitacion(Base):
     codigo_nuts = Column(String(20), nullable=True)
     
     # CPV
-    codigos_cpv = Column(JSON, nullable=True)  # Lista de códigos CPV
+    codigos_cpv = Column(JSONB, nullable=True)  # Lista de códigos CPV
     
     # Duración
     duracion = Column(Integer, nullable=True)
@@ -86,26 +87,82 @@ class Licitacion(Base):
     importe_adjudicacion = Column(DECIMAL(15, 2), nullable=True)
     
     # Análisis IA
-    conceptos_tic = Column(JSON, nullable=True)  # Lista de conceptos TIC detectados
-    stack_tecnologico = Column(JSON, nullable=True)  # Dict con categorías y tecnologías
-    resumen_tecnico = Column(JSON, nullable=True)  # Dict con análisis técnico
+    conceptos_tic = Column(JSONB, nullable=True)  # Lista de conceptos TIC detectados
+    stack_tecnologico = Column(JSONB, nullable=True)  # Dict con categorías y tecnologías
+    resumen_tecnico = Column(JSONB, nullable=True)  # Dict con análisis técnico
     analizado_ia = Column(Boolean, default=False)
     fecha_analisis_ia = Column(TIMESTAMP, nullable=True)
     
     # Metadatos
     link = Column(Text, nullable=True)
     fuente = Column(String(100), nullable=True)  # PLACSP, Cataluña, etc.
-    hash_contenido = Column(String(64), nullable=True, unique=True, index=True)
-    fecha_actualizacion = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    hash_contenido = Column(LargeBinary(32), nullable=True, unique=True, index=True)  # hashlib.sha256(...).digest()
+    fecha_actualizacion = Column(TIMESTAMP, nullable=False, server_default=func.now(), onupdate=func.now())
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
     
+    # Búsqueda de texto completo (columna generada por PostgreSQL, no se carga por defecto)
+    search_tsv = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "to_tsvector('spanish', coalesce(titulo, '') || ' ' || coalesce(resumen, '') || ' ' || coalesce(expediente, ''))",
+            persisted=True,
+        ),
+    ))
+    
     # Relaciones
     tecnologias = relationship("Tecnologia", secondary=licitaciones_tecnologias, back_populates="licitaciones")
     conceptos = relationship("ConceptoTIC", secondary=licitaciones_conceptos, back_populates="licitaciones")
     documentos = relationship("Documento", back_populates="licitacion", cascade="all, delete-orphan")
     adjudicaciones = relationship("Adjudicacion", back_populates="licitacion", cascade="all, delete-orphan")
     resumen_ia = relationship("ResumenIA", back_populates="licitacion", uselist=False, cascade="all, delete-orphan")
+    
+    # Índices GIN de trigramas para búsquedas ILIKE '%texto%' (requiere pg_trgm)
+    __table_args__ = (
+        Index("idx_licit_titulo_trgm", titulo, postgresql_using="gin", postgresql_ops={"titulo": "gin_trgm_ops"}),
+        Index("idx_licit_resumen_trgm", resumen, postgresql_using="gin", postgresql_ops={"resumen": "gin_trgm_ops"}),
+        Index("idx_licit_expediente_trgm", expediente, postgresql_using="gin", postgresql_ops={"expediente": "gin_trgm_ops"}),
+        Index("idx_licit_lugar_ejecucion_trgm", lugar_ejecucion, postgresql_using="gin", postgresql_ops={"lugar_ejecucion": "gin_trgm_ops"}),
+        Index(
+            "idx_licit_conceptos_tic_trgm",
+            cast(conceptos_tic, Text).label("conceptos_tic_text"),
+            postgresql_using="gin",
+            postgresql_ops={"conceptos_tic_text": "gin_trgm_ops"},
+        ),
+        Index(
+            "idx_licit_stack_tecnologico_trgm",
+            cast(stack_tecnologico, Text).label("stack_tecnologico_text"),
+            postgresql_using="gin",
+            postgresql_ops={"stack_tecnologico_text": "gin_trgm_ops"},
+        ),
+        
+        # Búsqueda de texto completo (search_tsv @@ websearch_to_tsquery(...))
+        Index("ix_licit_search_tsv", "search_tsv", postgresql_using="gin"),
+        
+        # Contención de CPV (codigos_cpv @> '["72000000"]')
+        Index("idx_licit_cpv_gin", codigos_cpv, postgresql_using="gin", postgresql_ops={"codigos_cpv": "jsonb_path_ops"}),
+        
+        # Orden del listado (ORDER BY fecha_actualizacion DESC, id DESC LIMIT n)
+        Index("ix_licit_fecha_desc", fecha_actualizacion.desc(), id.desc()),
+        Index(
+            "ix_licit_analizado_fecha",
+            fecha_actualizacion.desc(),
+            id.desc(),
+            postgresql_where=(analizado_ia == True),
+        ),
+        # Filtros de igualdad del listado con el mismo orden
+        Index("ix_licit_estado_fecha", estado, fecha_actualizacion.desc(), id.desc()),
+        Index("ix_licit_tipo_fecha", tipo_contrato, fecha_actualizacion.desc(), id.desc()),
+        Index("ix_licit_tipo_presupuesto", tipo_contrato, presupuesto_base),
+        
+        # Pendientes de título adaptado (index-only scan de id, titulo)
+        Index(
+            "ix_licit_sin_titulo",
+            id,
+            postgresql_include=["titulo"],
+            postgresql_where=text("titulo_adaptado IS NULL OR titulo_adaptado = ''"),
+        ),
+    )
 
 
 class Organismo(Base):
@@ -221,3 +278,19 @@ class ScrapingLog(Base):
     metadata_extra = Column(JSON, nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.now(), index=True)
 
+
+
+class EstadisticasSnapshot(Base):
+    """Snapshot materializado de las estadísticas generales (refrescado por Celery)."""
+    __tablename__ = 'stats_snapshot'
+    
+    id = Column(Integer, primary_key=True)
+    total_licitaciones = Column(Integer, nullable=False, default=0)
+    total_presupuesto = Column(DECIMAL(18, 2), nullable=True)
+    presupuesto_promedio = Column(DECIMAL(18, 2), nullable=True)
+    licitaciones_por_estado = Column(JSON, nullable=True)
+    licitaciones_por_tipo = Column(JSON, nullable=True)
+    licitaciones_por_concepto = Column(JSON, nullable=True)
+    top_tecnologias = Column(JSON, nullable=True)
+    evolucion_mensual = Column(JSON, nullable=True)
+    fecha_calculo = Column(TIMESTAMP, server_default=func.now(), nullable=False)
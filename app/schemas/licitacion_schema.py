@@ -1,7 +1,7 @@
 """
 Schemas Pydantic para Licitaciones
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -40,8 +40,7 @@ class DocumentoSchema(BaseModel):
     url_descarga: Optional[str] = None
     tamano_bytes: Optional[int] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class LicitacionListItem(BaseModel):
@@ -60,8 +59,7 @@ class LicitacionListItem(BaseModel):
     conceptos_tic: Optional[List[str]] = None
     analizado_ia: bool = False
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, extra='ignore')
 
 
 class LicitacionDetail(LicitacionListItem):
@@ -114,10 +112,11 @@ class LicitacionFilters(BaseModel):
 
 class LicitacionListResponse(BaseModel):
     """Schema para respuesta de lista de licitaciones"""
-    total: int
+    total: Optional[int] = None  # None en paginación por cursor
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
     items: List[LicitacionListItem]
 
 
@@ -3,9 +3,16 @@ Scraper para la Plataforma de Contratación Pública de Cataluña (Gencat)
 Utiliza SODA API (Socrata Open Data API)
 """
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Generator, Dict, Any, Optional, List
+import itertools
 import logging
+import orjson
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +29,10 @@ class GencatScraper:
     BASE_URL = "https://analisi.transparenciacatalunya.cat/resource/ybgg-dgi6.json"
     JSON_API_BASE = "https://contractaciopublica.cat/portal-api/documents-publicacio/json-xifrat"
     
+    PAGE_SIZE = 100  # Registros por página de la API SODA
+    MAX_PAGINAS_EN_VUELO = 8  # Páginas descargadas en paralelo
+    MAX_DOCUMENTOS_EN_VUELO = 8  # JSON de documentos descargados en paralelo por página
+    
     # Códigos CPV relacionados con TIC
     CPV_TIC = [
         "48000000-8",  # Paquetes de software y sistemas de información
@@ -43,6 +54,12 @@ class GencatScraper:
         "72600000-1",  # Servicios de apoyo informático y de consultoría
     ]
     
+    # Divisiones CPV (2 primeros dígitos) consideradas TIC: {"48", "72"}
+    _CPV_PREFIXES = frozenset(c[:2] for c in CPV_TIC)
+    
+    # Cláusula $where del filtro TIC: un único predicado IN en lugar de una cadena de OR
+    _CPV_WHERE = "codi_cpv IN (" + ",".join(f"'{c}'" for c in CPV_TIC) + ")"
+    
     # Keywords TIC en catalán
     KEYWORDS_TIC = [
         "programari", "software", "aplicació", "aplicación",
@@ -57,13 +74,30 @@ class GencatScraper:
         "big data", "analítica", "analytics"
     ]
     
+    # Todas las keywords en una sola regex (una pasada sobre el texto)
+    _KEYWORDS_RE = re.compile("|".join(re.escape(k.casefold()) for k in KEYWORDS_TIC))
+    
     def __init__(self):
         """Inicializa el scraper"""
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Liticia/1.0 (licitaciones TIC)',
-            'Accept': 'application/json'
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate'
         })
+        # Una conexión por página en vuelo; los 429/5xx transitorios se reintentan
+        # aquí en lugar de cortar el scraping completo
+        adapter = HTTPAdapter(
+            pool_connections=self.MAX_PAGINAS_EN_VUELO,
+            pool_maxsize=self.MAX_PAGINAS_EN_VUELO,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET"],
+            )
+        )
+        self.session.mount('https://', adapter)
     
     def _build_query_params(
         self,
@@ -106,9 +140,7 @@ class GencatScraper:
         
         # Filtro TIC por CPV
         if filtrar_tic and self.CPV_TIC:
-            # En SODA API, usamos OR para múltiples condiciones de CPV
-            cpv_conditions = " OR ".join([f"codi_cpv = '{cpv}'" for cpv in self.CPV_TIC])
-            where_conditions.append(f"({cpv_conditions})")
+            where_conditions.append(self._CPV_WHERE)
         
         # Combinar condiciones
         if where_conditions:
@@ -127,16 +159,18 @@ class GencatScraper:
             True si es licitación TIC, False en caso contrario
         """
         # Verificar CPV
-        cpv = licitacion.get('codi_cpv', '')
-        if any(cpv.startswith(tic_cpv[:2]) for tic_cpv in self.CPV_TIC):
+        cpv = licitacion.get('codi_cpv', '') or ''
+        if cpv[:2] in self._CPV_PREFIXES:
             return True
         
         # Verificar keywords en título y descripción
-        titulo = (licitacion.get('denominacio', '') or '').lower()
-        descripcion = (licitacion.get('objecte_contracte', '') or '').lower()
-        texto_completo = f"{titulo} {descripcion}"
+        # Cada campo por separado: sin concatenar textos largos y parando en el título
+        titulo = licitacion.get('denominacio', '') or ''
+        if titulo and self._KEYWORDS_RE.search(titulo.casefold()):
+            return True
         
-        return any(keyword.lower() in texto_completo for keyword in self.KEYWORDS_TIC)
+        descripcion = licitacion.get('objecte_contracte', '') or ''
+        return bool(descripcion and self._KEYWORDS_RE.search(descripcion.casefold()))
     
     def _extraer_documentos_desde_json(self, url_json: str) -> List[Dict[str, str]]:
         """
@@ -154,7 +188,7 @@ class GencatScraper:
         try:
             response = self.session.get(url_json, timeout=30)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             
             documentos = []
             
@@ -282,12 +316,29 @@ class GencatScraper:
         """Convierte un string ISO a datetime de forma segura"""
         if not value:
             return None
+        
+        # Camino rápido para el formato fijo de SODA: "2023-07-18T14:00:00.000"
+        if isinstance(value, str) and len(value) == 23 and value[10] == 'T' and value[19] == '.':
+            try:
+                return datetime(
+                    int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                    int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                    int(value[20:23]) * 1000
+                )
+            except ValueError:
+                pass
+        
         try:
-            # Formato: "2023-07-18T14:00:00.000"
             return datetime.fromisoformat(value.replace('Z', '+00:00'))
         except (ValueError, AttributeError):
             return None
     
+    def _obtener_pagina(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Descarga una página de la API SODA"""
+        response = self.session.get(self.BASE_URL, params=params, timeout=30)
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
     def scrape_all(
         self,
         fecha_desde: Optional[datetime] = None,
@@ -317,13 +368,19 @@ class GencatScraper:
         logger.info(f"Scraping Gencat desde {fecha_desde.date()} hasta {fecha_hasta.date()}")
         logger.info(f"Filtrar TIC: {filtrar_tic}")
         
-        offset = 0
-        limit = 100
+        limit = self.PAGE_SIZE
         total_procesadas = 0
         total_tic = 0
         
-        while total_procesadas < max_results:
-            # Construir parámetros de consulta
+        # Ventana deslizante de páginas en vuelo, consumidas en orden de offset
+        offsets = itertools.count(0, limit)
+        en_vuelo = max(1, min(self.MAX_PAGINAS_EN_VUELO, -(-max_results // limit)))
+        pendientes = deque()
+        executor = ThreadPoolExecutor(max_workers=en_vuelo)
+        executor_docs = ThreadPoolExecutor(max_workers=self.MAX_DOCUMENTOS_EN_VUELO)
+        
+        def _encolar_pagina():
+            offset = next(offsets)
             params = self._build_query_params(
                 fecha_desde=fecha_desde,
                 fecha_hasta=fecha_hasta,
@@ -331,50 +388,85 @@ class GencatScraper:
                 offset=offset,
                 filtrar_tic=filtrar_tic
             )
+            pendientes.append((offset, executor.submit(self._obtener_pagina, params)))
+        
+        try:
+            for _ in range(en_vuelo):
+                _encolar_pagina()
             
-            try:
-                # Hacer petición a la API
-                response = self.session.get(self.BASE_URL, params=params, timeout=30)
-                response.raise_for_status()
-                
-                licitaciones = response.json()
+            while pendientes and total_procesadas < max_results:
+                offset, future = pendientes.popleft()
                 
-                # Si no hay más resultados, terminar
-                if not licitaciones:
-                    logger.info(f"No hay más resultados. Total procesadas: {total_procesadas}")
-                    break
-                
-                logger.debug(f"Obtenidas {len(licitaciones)} licitaciones (offset: {offset})")
-                
-                # Procesar cada licitación
-                for licitacion in licitaciones:
-                    # Verificar si es TIC (doble filtro para mayor precisión)
-                    if filtrar_tic and not self._es_licitacion_tic(licitacion):
-                        continue
+                try:
+                    licitaciones = future.result()
                     
-                    # Mapear a modelo Liticia
-                    licitacion_mapeada = self._mapear_a_modelo_liticia(licitacion)
+                    # Si no hay más resultados, terminar
+                    if not licitaciones:
+                        logger.info(f"No hay más resultados. Total procesadas: {total_procesadas}")
+                        break
                     
-                    total_tic += 1
-                    total_procesadas += 1
+                    if len(licitaciones) < limit:
+                        # Página incompleta (antes del filtro TIC): es la última, no se
+                        # piden más y se descartan las posteriores ya encoladas
+                        for _, siguiente in pendientes:
+                            siguiente.cancel()
+                        pendientes.clear()
+                    else:
+                        # Mantener la ventana llena mientras se procesa esta página
+                        _encolar_pagina()
                     
-                    yield licitacion_mapeada
+                    logger.debug(f"Obtenidas {len(licitaciones)} licitaciones (offset: {offset})")
                     
-                    if total_procesadas >= max_results:
-                        break
-                
-                # Incrementar offset para siguiente página
-                offset += limit
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error en petición a API Gencat: {e}")
-                break
-            except Exception as e:
-                logger.error(f"Error procesando licitaciones Gencat: {e}")
-                break
+                    # Verificar si es TIC (doble filtro para mayor precisión)
+                    if filtrar_tic:
+                        licitaciones = [l for l in licitaciones if self._es_licitacion_tic(l)]
+                    licitaciones = licitaciones[:max_results - total_procesadas]
+                    
+                    # Mapear a modelo Liticia: cada mapeo descarga el JSON de documentos,
+                    # así que se lanzan en paralelo (map conserva el orden)
+                    for licitacion_mapeada in executor_docs.map(self._mapear_a_modelo_liticia, licitaciones):
+                        total_tic += 1
+                        total_procesadas += 1
+                        
+                        yield licitacion_mapeada
+                    
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"Error en petición a API Gencat: {e}")
+                    break
+                except Exception as e:
+                    logger.error(f"Error procesando licitaciones Gencat: {e}")
+                    break
+        finally:
+            # Cancelar las páginas que ya no se van a consumir
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor_docs.shutdown(wait=False, cancel_futures=True)
         
         logger.info(f"Scraping completado. Total licitaciones TIC: {total_tic}")
     
+    def scrape_batches(self, batch_size: int = 1000, **kwargs) -> Generator[List[Dict[str, Any]], None, None]:
+        """
+        Igual que scrape_all pero agrupando las licitaciones en lotes
+        
+        Pensado para consumidores que escriben en BD por lotes (una query de
+        existentes y un commit por lote en lugar de por registro).
+        
+        Args:
+            batch_size: Número de licitaciones por lote
+            **kwargs: Argumentos de scrape_all
+        
+        Yields:
+            Listas de hasta batch_size licitaciones mapeadas
+        """
+        lote = []
+        for licitacion in self.scrape_all(**kwargs):
+            lote.append(licitacion)
+            if len(lote) >= batch_size:
+                yield lote
+                lote = []
+        
+        if lote:
+            yield lote
+    
     def scrape_hot(self) -> Generator[Dict[str, Any], None, None]:
         """Scrapea licitaciones de las últimas 24 horas"""
         fecha_desde = datetime.now() - timedelta(hours=24)
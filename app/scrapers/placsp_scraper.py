@@ -2,15 +2,32 @@
 Scraper para PLACSP (Plataforma de Contratación del Sector Público)
 Utiliza el feed ATOM oficial de datos abiertos
 """
-import feedparser
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Generator
-from datetime import datetime
+from datetime import datetime, timedelta
 from lxml import etree
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# Tabla para quitar tildes con str.translate (una pasada en C)
+_SIN_ACENTOS = str.maketrans('áéíóúü', 'aeiouu')
+
+
+def _reducir_keywords(keywords: List[str]) -> List[str]:
+    """
+    Normaliza las keywords (minúsculas, sin tildes) y quita las redundantes
+    
+    Se descartan duplicados y las keywords que contienen a otra: si la más
+    corta no aparece en el texto, la más larga tampoco.
+    """
+    normalizadas = sorted({k.lower().translate(_SIN_ACENTOS) for k in keywords})
+    return [k for k in normalizadas if not any(otra != k and otra in k for otra in normalizadas)]
+
 
 class PLACSPScraper:
     """Scraper para licitaciones de PLACSP usando feed ATOM"""
@@ -18,6 +35,47 @@ class PLACSPScraper:
     # URL base del feed ATOM
     BASE_FEED_URL = "https://contrataciondelsectorpublico.gob.es/sindicacion/sindicacion_643/licitacionesPerfilesContratanteCompleto3.atom"
     
+    # Elementos ATOM que se procesan en streaming
+    ATOM_NS = 'http://www.w3.org/2005/Atom'
+    _ATOM_FEED = f'{{{ATOM_NS}}}feed'
+    _ATOM_ENTRY = f'{{{ATOM_NS}}}entry'
+    _ATOM_LINK = f'{{{ATOM_NS}}}link'
+    _ATOM_ID = f'{{{ATOM_NS}}}id'
+    _ATOM_TITLE = f'{{{ATOM_NS}}}title'
+    _ATOM_SUMMARY = f'{{{ATOM_NS}}}summary'
+    _ATOM_UPDATED = f'{{{ATOM_NS}}}updated'
+    
+    # Namespaces del XML CODICE
+    NAMESPACES = {
+        'cac': 'urn:dgpe:names:draft:codice:schema:xsd:CommonAggregateComponents-2',
+        'cbc': 'urn:dgpe:names:draft:codice:schema:xsd:CommonBasicComponents-2',
+        'cac-place-ext': 'urn:dgpe:names:draft:codice-place-ext:schema:xsd:CommonAggregateComponents-2',
+        'cbc-place-ext': 'urn:dgpe:names:draft:codice-place-ext:schema:xsd:CommonBasicComponents-2',
+    }
+    
+    # XPath precompiladas una sola vez para todas las entradas
+    _XP_EXPEDIENTE = etree.XPath('string(.//cbc:ContractFolderID)', namespaces=NAMESPACES, smart_strings=False)
+    _XP_ESTADO = etree.XPath('string(.//cbc-place-ext:ContractFolderStatusCode)', namespaces=NAMESPACES, smart_strings=False)
+    _XP_CPV = etree.XPath('.//cbc:ItemClassificationCode/text()', namespaces=NAMESPACES, smart_strings=False)
+    _XP_IMPORTE = etree.XPath('string(.//cbc:TaxExclusiveAmount[@currencyID="EUR"])', namespaces=NAMESPACES, smart_strings=False)
+    _XP_ORGANO = etree.XPath('string(.//cbc:Name)', namespaces=NAMESPACES, smart_strings=False)
+    _XP_TIPO = etree.XPath('string(.//cbc:TypeCode)', namespaces=NAMESPACES, smart_strings=False)
+    _XP_LUGAR = etree.XPath('string(.//cbc:CountrySubentity)', namespaces=NAMESPACES, smart_strings=False)
+    _XP_NUTS = etree.XPath('string(.//cbc:CountrySubentityCode)', namespaces=NAMESPACES, smart_strings=False)
+    _XP_DOC_ID = etree.XPath('string(.//cbc:ID)', namespaces=NAMESPACES, smart_strings=False)
+    _XP_DOC_URI = etree.XPath('string(.//cbc:URI)', namespaces=NAMESPACES, smart_strings=False)
+    _XP_LINK = etree.XPath('string(atom:link/@href)', namespaces={'atom': ATOM_NS}, smart_strings=False)
+    _XP_DOCUMENTOS = (
+        (etree.XPath('.//cac:LegalDocumentReference', namespaces=NAMESPACES), 'pliego_administrativo'),
+        (etree.XPath('.//cac:TechnicalDocumentReference', namespaces=NAMESPACES), 'pliego_tecnico'),
+        (etree.XPath('.//cac:AdditionalDocumentReference', namespaces=NAMESPACES), 'anexo'),
+    )
+    
+    TIPOS_CONTRATO = {'1': 'Suministros', '2': 'Servicios', '3': 'Obras', 
+                      '7': 'Administrativo especial', '8': 'Privado',
+                      '21': 'Concesión de Servicios', '22': 'Concesión de Obras',
+                      '40': 'Patrimonial'}
+    
     # Códigos CPV relacionados con TIC (primeros dígitos)
     CPV_TIC = [
         '48',  # Paquetes de software y sistemas de información
@@ -52,6 +110,14 @@ class PLACSPScraper:
         'licencia', 'licencias', 'microsoft', 'adobe', 'autodesk',
     ]
     
+    # Prefijos CPV agrupados por longitud (2 y 5 dígitos): cada código se comprueba
+    # con dos búsquedas en frozenset en lugar de recorrer todos los prefijos
+    _CPV_TIC_2 = frozenset(p for p in CPV_TIC if len(p) == 2)
+    _CPV_TIC_5 = frozenset(p for p in CPV_TIC if len(p) == 5)
+    
+    # Una sola pasada sobre el texto para todas las keywords en lugar de una búsqueda por keyword
+    _KEYWORDS_RE = re.compile("|".join(re.escape(k) for k in _reducir_keywords(KEYWORDS_TIC)))
+    
     def __init__(self, session: Optional[requests.Session] = None):
         """
         Inicializa el scraper
@@ -59,182 +125,147 @@ class PLACSPScraper:
         Args:
             session: Sesión de requests opcional para reutilizar conexiones
         """
-        self.session = session or requests.Session()
+        if session is None:
+            session = requests.Session()
+            # Conexiones persistentes al host del feed y reintento de 429/5xx transitorios
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=20,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.5,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["GET"],
+                )
+            )
+            session.mount('https://', adapter)
+        
+        self.session = session
         self.session.headers.update({
-            'User-Agent': 'Liticia/1.0 (Scraper de licitaciones TIC; +https://liticia.es)'
+            'User-Agent': 'Liticia/1.0 (Scraper de licitaciones TIC; +https://liticia.es)',
+            # El XML del feed ATOM comprime muy bien
+            'Accept-Encoding': 'gzip, deflate'
         })
         
-    def fetch_feed(self, url: str) -> feedparser.FeedParserDict:
+    def _iter_entries(self, url: str, siguiente: List[Optional[str]]) -> Generator[etree._Element, None, None]:
         """
-        Descarga y parsea un feed ATOM
+        Descarga un feed ATOM y recorre sus entradas en streaming
+        
+        Cada entrada se libera tras procesarla, así que nunca se mantiene en
+        memoria el árbol completo de la página.
         
         Args:
             url: URL del feed ATOM
+            siguiente: Lista de un elemento donde se guarda la URL de la siguiente página
             
-        Returns:
-            Feed parseado
+        Yields:
+            Elementos <entry> del feed
         """
         logger.info(f"Descargando feed: {url}")
-        response = self.session.get(url, timeout=30)
-        response.raise_for_status()
-        
-        feed = feedparser.parse(response.content)
-        logger.info(f"Feed descargado: {len(feed.entries)} entradas")
-        
-        return feed
+        with self.session.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            # Descomprimir gzip/deflate al leer del socket
+            response.raw.decode_content = True
+            
+            context = etree.iterparse(response.raw, events=('end',), tag=(self._ATOM_ENTRY, self._ATOM_LINK))
+            for _, elem in context:
+                if elem.tag == self._ATOM_LINK:
+                    # Solo el <link rel="next"> del feed; los de cada entrada se leen en parse_entry
+                    if elem.get('rel') == 'next' and elem.getparent().tag == self._ATOM_FEED:
+                        siguiente[0] = elem.get('href')
+                    continue
+                
+                yield elem
+                
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
     
     def extract_namespaces(self, entry_content: str) -> Dict[str, str]:
         """Extrae namespaces del contenido XML"""
-        return {
-            'cac': 'urn:dgpe:names:draft:codice:schema:xsd:CommonAggregateComponents-2',
-            'cbc': 'urn:dgpe:names:draft:codice:schema:xsd:CommonBasicComponents-2',
-            'cac-place-ext': 'urn:dgpe:names:draft:codice-place-ext:schema:xsd:CommonAggregateComponents-2',
-            'cbc-place-ext': 'urn:dgpe:names:draft:codice-place-ext:schema:xsd:CommonBasicComponents-2',
-        }
+        return dict(self.NAMESPACES)
     
-    def parse_entry(self, entry: feedparser.FeedParserDict) -> Dict:
+    def parse_entry(self, entry: etree._Element) -> Dict:
         """
         Parsea una entrada del feed ATOM y extrae todos los datos relevantes
         
         Args:
-            entry: Entrada del feed
+            entry: Elemento <entry> del feed
             
         Returns:
             Diccionario con los datos de la licitación
         """
-        # Parsear el contenido XML de la entrada
-        content = entry.get('content', [{}])[0].get('value', '')
-        if not content:
-            content = entry.get('summary', '')
-        
         # Datos básicos del feed
         data = {
-            'id_licitacion': entry.get('id', ''),
-            'link': entry.get('link', ''),
-            'titulo': entry.get('title', ''),
-            'resumen': entry.get('summary', ''),
-            'fecha_actualizacion': entry.get('updated', ''),
+            'id_licitacion': entry.findtext(self._ATOM_ID, ''),
+            'link': self._XP_LINK(entry),
+            'titulo': entry.findtext(self._ATOM_TITLE, ''),
+            'resumen': entry.findtext(self._ATOM_SUMMARY, ''),
+            'fecha_actualizacion': entry.findtext(self._ATOM_UPDATED, ''),
         }
         
-        # Parsear XML para extraer datos estructurados
+        # Datos estructurados del XML CODICE embebido en la entrada
         try:
-            # Buscar el contenido XML en tags
-            for tag in entry.get('tags', []):
-                if hasattr(tag, 'term') and 'ContractFolderStatus' in tag.term:
-                    content = str(tag)
-            
-            # Si hay contenido XML, parsearlo
-            if '<cac' in str(entry) or '<cbc' in str(entry):
-                # Extraer del entry completo
-                xml_str = str(entry)
-                
-                # Extraer expediente
-                if 'ContractFolderID' in xml_str:
-                    import re
-                    match = re.search(r'<cbc:ContractFolderID>([^<]+)</cbc:ContractFolderID>', xml_str)
-                    if match:
-                        data['expediente'] = match.group(1)
-                
-                # Extraer estado
-                if 'ContractFolderStatusCode' in xml_str:
-                    import re
-                    match = re.search(r'>([A-Z]+)</cbc-place-ext:ContractFolderStatusCode>', xml_str)
-                    if match:
-                        data['estado'] = match.group(1)
-                
-                # Extraer códigos CPV
-                import re
-                cpv_matches = re.findall(r'<cbc:ItemClassificationCode[^>]*>(\d+)</cbc:ItemClassificationCode>', xml_str)
-                if cpv_matches:
-                    data['codigos_cpv'] = list(set(cpv_matches))
-                
-                # Extraer importes
-                amount_match = re.search(r'<cbc:TaxExclusiveAmount currencyID="EUR">([^<]+)</cbc:TaxExclusiveAmount>', xml_str)
-                if amount_match:
-                    try:
-                        data['presupuesto_base'] = float(amount_match.group(1))
-                    except ValueError:
-                        pass
-                
-                # Extraer órgano de contratación
-                org_match = re.search(r'<cbc:Name>([^<]+)</cbc:Name>', xml_str)
-                if org_match:
-                    data['organo_contratacion'] = org_match.group(1)
-                
-                # Extraer tipo de contrato
-                type_match = re.search(r'<cbc:TypeCode[^>]*>(\d+)</cbc:TypeCode>', xml_str)
-                if type_match:
-                    type_code = type_match.group(1)
-                    tipos = {'1': 'Suministros', '2': 'Servicios', '3': 'Obras', 
-                            '7': 'Administrativo especial', '8': 'Privado',
-                            '21': 'Concesión de Servicios', '22': 'Concesión de Obras',
-                            '40': 'Patrimonial'}
-                    data['tipo_contrato'] = tipos.get(type_code, f'Tipo {type_code}')
-                
-                # Extraer lugar de ejecución
-                location_match = re.search(r'<cbc:CountrySubentity>([^<]+)</cbc:CountrySubentity>', xml_str)
-                if location_match:
-                    data['lugar_ejecucion'] = location_match.group(1)
-                
-                # Extraer código NUTS
-                nuts_match = re.search(r'<cbc:CountrySubentityCode[^>]*>([^<]+)</cbc:CountrySubentityCode>', xml_str)
-                if nuts_match:
-                    data['codigo_nuts'] = nuts_match.group(1)
-                
-                # Extraer documentos adjuntos (PDFs)
-                documentos = []
-                
-                # Buscar LegalDocumentReference (Pliego de Cláusulas Administrativas)
-                legal_docs = re.findall(
-                    r'<cac:LegalDocumentReference>.*?<cbc:ID>([^<]+)</cbc:ID>.*?<cbc:URI>([^<]+)</cbc:URI>.*?</cac:LegalDocumentReference>',
-                    xml_str,
-                    re.DOTALL
-                )
-                for nombre, url in legal_docs:
-                    # Decodificar entidades HTML
-                    url = url.replace('&amp;', '&')
-                    documentos.append({
-                        'nombre': nombre,
-                        'tipo': 'pliego_administrativo',
-                        'url': url
-                    })
-                
-                # Buscar TechnicalDocumentReference (Pliego de Prescripciones Técnicas)
-                tech_docs = re.findall(
-                    r'<cac:TechnicalDocumentReference>.*?<cbc:ID>([^<]+)</cbc:ID>.*?<cbc:URI>([^<]+)</cbc:URI>.*?</cac:TechnicalDocumentReference>',
-                    xml_str,
-                    re.DOTALL
-                )
-                for nombre, url in tech_docs:
-                    url = url.replace('&amp;', '&')
-                    documentos.append({
-                        'nombre': nombre,
-                        'tipo': 'pliego_tecnico',
-                        'url': url
-                    })
-                
-                # Buscar AdditionalDocumentReference (Otros documentos)
-                additional_docs = re.findall(
-                    r'<cac:AdditionalDocumentReference>.*?<cbc:ID>([^<]+)</cbc:ID>.*?<cbc:URI>([^<]+)</cbc:URI>.*?</cac:AdditionalDocumentReference>',
-                    xml_str,
-                    re.DOTALL
-                )
-                for nombre, url in additional_docs:
-                    url = url.replace('&amp;', '&')
+            self._parse_xml(entry, data)
+        except Exception as e:
+            logger.warning(f"Error parseando XML de entrada: {e}")
+        
+        return data
+    
+    def _parse_xml(self, root: etree._Element, data: Dict) -> None:
+        """Extrae los datos estructurados del XML CODICE con las XPath precompiladas"""
+        expediente = self._XP_EXPEDIENTE(root)
+        if expediente:
+            data['expediente'] = expediente
+        
+        estado = self._XP_ESTADO(root)
+        if estado:
+            data['estado'] = estado
+        
+        cpv_matches = self._XP_CPV(root)
+        if cpv_matches:
+            # Sin duplicados y en el orden del documento; con un solo CPV no hay nada que deduplicar
+            data['codigos_cpv'] = cpv_matches if len(cpv_matches) < 2 else list(dict.fromkeys(cpv_matches))
+        
+        importe = self._XP_IMPORTE(root)
+        if importe:
+            try:
+                data['presupuesto_base'] = float(importe)
+            except ValueError:
+                pass
+        
+        organo = self._XP_ORGANO(root)
+        if organo:
+            data['organo_contratacion'] = organo
+        
+        type_code = self._XP_TIPO(root)
+        if type_code:
+            data['tipo_contrato'] = self.TIPOS_CONTRATO.get(type_code, f'Tipo {type_code}')
+        
+        lugar = self._XP_LUGAR(root)
+        if lugar:
+            data['lugar_ejecucion'] = lugar
+        
+        nuts = self._XP_NUTS(root)
+        if nuts:
+            data['codigo_nuts'] = nuts
+        
+        # Documentos adjuntos (PDFs); lxml ya decodifica las entidades (&amp;)
+        documentos = []
+        for xp_referencias, tipo in self._XP_DOCUMENTOS:
+            for referencia in xp_referencias(root):
+                nombre = self._XP_DOC_ID(referencia)
+                url = self._XP_DOC_URI(referencia)
+                if nombre and url:
                     documentos.append({
                         'nombre': nombre,
-                        'tipo': 'anexo',
+                        'tipo': tipo,
                         'url': url
                     })
-                
-                if documentos:
-                    data['documentos'] = documentos
-                    logger.debug(f"Encontrados {len(documentos)} documentos para licitación {data.get('titulo', '')[:50]}")
-        
-        except Exception as e:
-            logger.warning(f"Error parseando XML de entrada: {e}")
         
-        return data
+        if documentos:
+            data['documentos'] = documentos
+            logger.debug(f"Encontrados {len(documentos)} documentos para licitación {data.get('titulo', '')[:50]}")
     
     def es_licitacion_tic(self, licitacion: Dict) -> bool:
         """
@@ -247,26 +278,24 @@ class PLACSPScraper:
             True si es licitación TIC, False en caso contrario
         """
         # Filtro 1: Por código CPV
-        codigos_cpv = licitacion.get('codigos_cpv', [])
-        for cpv in codigos_cpv:
-            for cpv_tic in self.CPV_TIC:
-                if cpv.startswith(cpv_tic):
-                    logger.debug(f"Licitación TIC por CPV {cpv}: {licitacion.get('titulo', '')[:50]}")
-                    return True
+        for cpv in licitacion.get('codigos_cpv', []):
+            if cpv[:2] in self._CPV_TIC_2 or cpv[:5] in self._CPV_TIC_5:
+                logger.debug(f"Licitación TIC por CPV {cpv}: {licitacion.get('titulo', '')[:50]}")
+                return True
         
         # Filtro 2: Por keywords en título
-        titulo = licitacion.get('titulo', '').lower()
-        for keyword in self.KEYWORDS_TIC:
-            if keyword in titulo:
-                logger.debug(f"Licitación TIC por keyword '{keyword}' en título: {titulo[:50]}")
-                return True
+        titulo = licitacion.get('titulo', '').lower().translate(_SIN_ACENTOS)
+        match = self._KEYWORDS_RE.search(titulo)
+        if match:
+            logger.debug(f"Licitación TIC por keyword '{match.group()}' en título: {titulo[:50]}")
+            return True
         
         # Filtro 3: Por keywords en resumen
-        resumen = licitacion.get('resumen', '').lower()
-        for keyword in self.KEYWORDS_TIC:
-            if keyword in resumen:
-                logger.debug(f"Licitación TIC por keyword '{keyword}' en resumen: {titulo[:50]}")
-                return True
+        resumen = licitacion.get('resumen', '').lower().translate(_SIN_ACENTOS)
+        match = self._KEYWORDS_RE.search(resumen)
+        if match:
+            logger.debug(f"Licitación TIC por keyword '{match.group()}' en resumen: {titulo[:50]}")
+            return True
         
         return False
     
@@ -281,10 +310,12 @@ class PLACSPScraper:
         Returns:
             Tupla (lista de licitaciones, URL de siguiente página o None)
         """
-        feed = self.fetch_feed(url)
+        siguiente = [None]
+        total = 0
         
         licitaciones = []
-        for entry in feed.entries:
+        for entry in self._iter_entries(url, siguiente):
+            total += 1
             licitacion = self.parse_entry(entry)
             
             # Filtrar por TIC si se solicita
@@ -293,14 +324,10 @@ class PLACSPScraper:
             
             licitaciones.append(licitacion)
         
-        # Obtener URL de siguiente página
-        next_url = None
-        for link in feed.feed.get('links', []):
-            if link.get('rel') == 'next':
-                next_url = link.get('href')
-                break
+        # URL de siguiente página (leída del propio feed durante el parseo)
+        next_url = siguiente[0]
         
-        logger.info(f"Scraped {len(licitaciones)} licitaciones TIC de {len(feed.entries)} totales")
+        logger.info(f"Scraped {len(licitaciones)} licitaciones TIC de {total} totales")
         
         return licitaciones, next_url
     
@@ -315,28 +342,35 @@ class PLACSPScraper:
         Yields:
             Diccionarios con datos de licitaciones
         """
-        url = self.BASE_FEED_URL
         page = 0
         
-        while url:
-            page += 1
-            logger.info(f"Scraping página {page}...")
-            
-            licitaciones, next_url = self.scrape_feed_page(url, filtrar_tic=filtrar_tic)
-            
-            for licitacion in licitaciones:
-                yield licitacion
-            
-            # Verificar si continuar
-            if max_pages and page >= max_pages:
-                logger.info(f"Alcanzado límite de {max_pages} páginas")
-                break
-            
-            url = next_url
+        # La paginación del feed es opaca (la URL de la página N+1 solo se conoce
+        # al leer la N), así que no se pueden pedir páginas en paralelo: se
+        # descarga la siguiente en segundo plano mientras se consume la actual
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(self.scrape_feed_page, self.BASE_FEED_URL, filtrar_tic)
             
-            if not url:
-                logger.info("No hay más páginas")
-                break
+            while future is not None:
+                page += 1
+                logger.info(f"Scraping página {page}...")
+                
+                licitaciones, next_url = future.result()
+                future = None
+                
+                # Verificar si continuar
+                if max_pages and page >= max_pages:
+                    logger.info(f"Alcanzado límite de {max_pages} páginas")
+                elif not next_url:
+                    logger.info("No hay más páginas")
+                else:
+                    future = executor.submit(self.scrape_feed_page, next_url, filtrar_tic)
+                
+                for licitacion in licitaciones:
+                    yield licitacion
+        finally:
+            # Cancelar la página precargada si el consumidor deja de iterar
+            executor.shutdown(wait=False, cancel_futures=True)
     
     def scrape_recent(self, days: int = 7, filtrar_tic: bool = True) -> List[Dict]:
         """
@@ -349,17 +383,18 @@ class PLACSPScraper:
         Returns:
             Lista de licitaciones
         """
-        from datetime import timedelta
-        
-        cutoff_date = datetime.now() - timedelta(days=days)
+        # Con zona horaria: las fechas del feed llevan offset (+01:00 en invierno, +02:00 en verano)
+        cutoff_date = datetime.now().astimezone() - timedelta(days=days)
         licitaciones = []
         
         for licitacion in self.scrape_all(max_pages=50, filtrar_tic=filtrar_tic):
             # Parsear fecha de actualización
             fecha_str = licitacion.get('fecha_actualizacion', '')
             try:
-                # Formato: 2025-10-15T17:00:00.008+02:00
-                fecha = datetime.fromisoformat(fecha_str.replace('+02:00', ''))
+                # Formato: 2025-10-15T17:00:00.008+02:00 (fromisoformat en C entiende el offset)
+                fecha = datetime.fromisoformat(fecha_str)
+                if fecha.tzinfo is None:
+                    fecha = fecha.astimezone()
                 
                 if fecha < cutoff_date:
                     logger.info(f"Alcanzada fecha límite: {fecha}")
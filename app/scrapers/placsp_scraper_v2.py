@@ -3,14 +3,23 @@ Scraper mejorado para PLACSP (Plataforma de Contratación del Sector Público)
 Utiliza lxml para parsear correctamente el XML del feed ATOM
 """
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Generator
 from datetime import datetime, timedelta
 from lxml import etree
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
 
+def _compilar_xpaths(rutas: Dict[str, str], namespaces: Dict[str, str]) -> Dict[str, etree.XPath]:
+    """Compila cada expresión XPath una sola vez al cargar el módulo"""
+    return {clave: etree.XPath(ruta, namespaces=namespaces) for clave, ruta in rutas.items()}
+
+
 class PLACSPScraperV2:
     """Scraper mejorado para licitaciones de PLACSP usando feed ATOM"""
     
@@ -26,15 +35,100 @@ class PLACSPScraperV2:
         'cbc-place-ext': 'urn:dgpe:names:draft:codice-place-ext:schema:xsd:CommonBasicComponents-2',
     }
     
-    # Códigos CPV relacionados con TIC
-    CPV_TIC = [
+    # XPath precompiladas una sola vez; parse_entry las usa por clave.
+    # Rutas exactas de hijos según el esquema CODICE en lugar de './/': cada
+    # llamada visita solo la rama indicada y no todo el subárbol. Quedan con
+    # './/' las que no tienen una posición fija dentro de su elemento.
+    _XP = _compilar_xpaths({
+        # Entrada ATOM
+        'atom_id': 'atom:id',
+        'atom_link': 'atom:link',
+        'atom_title': 'atom:title',
+        'atom_summary': 'atom:summary',
+        'atom_updated': 'atom:updated',
+        'cfs': 'cac-place-ext:ContractFolderStatus',
+        # ContractFolderStatus
+        'expediente': 'cbc:ContractFolderID',
+        'estado': 'cbc-place-ext:ContractFolderStatusCode',
+        'organo': 'cac-place-ext:LocatedContractingParty/cac:Party',
+        'proyecto': 'cac:ProcurementProject',
+        'terminos': 'cac:TenderingTerms',
+        'resultado': 'cac:TenderResult',
+        'documentos': (
+            'cac:LegalDocumentReference'
+            ' | cac:TechnicalDocumentReference'
+            ' | cac-place-ext:GeneralDocument/cac-place-ext:GeneralDocumentDocumentReference'
+        ),
+        # Party (órgano y adjudicatario)
+        'party_nombre': 'cac:PartyName/cbc:Name',
+        'organo_nif': 'cac:PartyIdentification/cbc:ID[@schemeName="NIF"]',
+        'organo_web': 'cbc:WebsiteURI',
+        'organo_email': 'cac:Contact/cbc:ElectronicMail',
+        'organo_telefono': 'cac:Contact/cbc:Telephone',
+        'organo_direccion': 'cac:PostalAddress',
+        'ciudad': 'cbc:CityName',
+        'codigo_postal': 'cbc:PostalZone',
+        # ProcurementProject
+        'tipo_contrato': 'cbc:TypeCode',
+        'presupuesto': 'cac:BudgetAmount',
+        'importe_sin_iva': 'cbc:TaxExclusiveAmount',
+        'valor_estimado': 'cbc:EstimatedOverallContractAmount',
+        'lugar': 'cac:RealizedLocation',
+        'lugar_nombre': 'cbc:CountrySubentity',
+        'lugar_nuts': 'cbc:CountrySubentityCode',
+        'duracion': 'cac:PlannedPeriod/cbc:DurationMeasure',
+        # TenderingTerms
+        'procedimiento': './/cbc:ProcedureCode',
+        'financiacion': 'cbc:FundingProgramCode',
+        'fecha_limite': './/cac:TenderSubmissionDeadlinePeriod/cbc:EndDate',
+        'hora_limite': './/cac:TenderSubmissionDeadlinePeriod/cbc:EndTime',
+        # TenderResult
+        'resultado_codigo': 'cbc:ResultCode',
+        'fecha_adjudicacion': 'cbc:AwardDate',
+        'adjudicatario': 'cac:WinningParty',
+        'adjudicatario_nif': 'cac:PartyIdentification/cbc:ID',
+        'importe_adjudicacion': './/cbc:AwardedTenderedAmount',
+        # Referencias a documentos
+        'doc_id': 'cbc:ID',
+        'doc_uri': 'cac:Attachment/cac:ExternalReference/cbc:URI',
+        'doc_tipo': 'cbc:DocumentTypeCode',
+    }, NAMESPACES)
+    
+    # Tipos de contrato (cbc:TypeCode del ProcurementProject)
+    TIPOS_CONTRATO = {'1': 'Suministros', '2': 'Servicios', '3': 'Obras', 
+                      '7': 'Administrativo especial', '8': 'Privado',
+                      '21': 'Concesión de Servicios', '22': 'Concesión de Obras',
+                      '40': 'Patrimonial'}
+    
+    # Hijos que se recorren directamente por tag (notación Clark), sin pasar por XPath
+    _Q_CLASIFICACION = f"{{{NAMESPACES['cac']}}}RequiredCommodityClassification"
+    _Q_CODIGO_CPV = f"{{{NAMESPACES['cbc']}}}ItemClassificationCode"
+    _Q_DOC_LEGAL = f"{{{NAMESPACES['cac']}}}LegalDocumentReference"
+    _Q_DOC_TECNICO = f"{{{NAMESPACES['cac']}}}TechnicalDocumentReference"
+    
+    # Opciones del parser: sin nodos de espacios en blanco, sin tabla de xml:id y
+    # sin resolver entidades. Se crea un parser por llamada porque los parsers
+    # de lxml no se pueden compartir entre hilos (la precarga de páginas usa uno aparte)
+    _OPCIONES_PARSER = {
+        'remove_blank_text': True,
+        'collect_ids': False,
+        'resolve_entities': False,
+    }
+    
+    # Elementos ATOM que se procesan en streaming (notación Clark)
+    _ATOM_FEED = '{http://www.w3.org/2005/Atom}feed'
+    _ATOM_ENTRY = '{http://www.w3.org/2005/Atom}entry'
+    _ATOM_LINK = '{http://www.w3.org/2005/Atom}link'
+    
+    # Códigos CPV relacionados con TIC (tupla: str.startswith los comprueba todos en una llamada)
+    CPV_TIC = (
         '48',  # Paquetes de software y sistemas de información
         '72',  # Servicios TI: consultoría, desarrollo, Internet
         '30200',  # Equipo informático
         '32400',  # Redes
         '32420',  # Componentes de red
         '32500',  # Telecomunicaciones
-    ]
+    )
     
     # Keywords para identificar licitaciones TIC
     KEYWORDS_TIC = [
@@ -60,11 +154,31 @@ class PLACSPScraperV2:
         'licencia', 'licencias', 'microsoft', 'adobe', 'autodesk',
     ]
     
+    # Una sola pasada sobre el texto para todas las keywords en lugar de una búsqueda por keyword
+    _KEYWORDS_RE = re.compile("|".join(re.escape(k.lower()) for k in KEYWORDS_TIC))
+    
     def __init__(self, session: Optional[requests.Session] = None):
         """Inicializa el scraper"""
-        self.session = session or requests.Session()
+        if session is None:
+            session = requests.Session()
+            # Conexiones persistentes al host del feed y reintento de 429/5xx transitorios
+            adapter = HTTPAdapter(
+                pool_connections=2,
+                pool_maxsize=2,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.5,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["GET"],
+                )
+            )
+            session.mount('https://', adapter)
+        
+        self.session = session
         self.session.headers.update({
-            'User-Agent': 'Liticia/1.0 (Scraper de licitaciones TIC; +https://liticia.es)'
+            'User-Agent': 'Liticia/1.0 (Scraper de licitaciones TIC; +https://liticia.es)',
+            # El XML del feed ATOM comprime muy bien
+            'Accept-Encoding': 'gzip, deflate'
         })
         
     def fetch_feed_xml(self, url: str) -> etree._Element:
@@ -73,318 +187,374 @@ class PLACSPScraperV2:
         response = self.session.get(url, timeout=30)
         response.raise_for_status()
         
-        root = etree.fromstring(response.content)
+        root = etree.fromstring(response.content, parser=etree.XMLParser(**self._OPCIONES_PARSER))
         logger.info(f"Feed descargado correctamente")
         
         return root
     
+    def _iter_entries(self, url: str, siguiente: List[Optional[str]]) -> Generator[etree._Element, None, None]:
+        """
+        Descarga un feed ATOM y recorre sus entradas en streaming
+        
+        El XML se parsea a medida que llega y cada entrada se libera tras
+        procesarla: nunca se construye el árbol completo de la página.
+        
+        Args:
+            url: URL del feed ATOM
+            siguiente: Lista de un elemento donde se guarda la URL de la siguiente página
+            
+        Yields:
+            Elementos <entry> del feed
+        """
+        logger.info(f"Descargando feed: {url}")
+        with self.session.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            # Descomprimir gzip/deflate al leer del socket
+            response.raw.decode_content = True
+            
+            context = etree.iterparse(
+                response.raw,
+                events=('end',),
+                tag=(self._ATOM_ENTRY, self._ATOM_LINK),
+                **self._OPCIONES_PARSER
+            )
+            for _, elem in context:
+                if elem.tag == self._ATOM_LINK:
+                    # Solo el <link rel="next"> del feed; los de cada entrada se leen en parse_entry
+                    if elem.get('rel') == 'next' and elem.getparent().tag == self._ATOM_FEED:
+                        siguiente[0] = elem.get('href')
+                    continue
+                
+                yield elem
+                
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+    
     def parse_entry(self, entry: etree._Element) -> Dict:
         """Parsea una entrada del feed ATOM"""
-        ns = self.NAMESPACES
-        
+        data = self._parse_entry_minimal(entry)
+        self._parse_entry_full(entry, data)
+        return data
+    
+    def _parse_entry_minimal(self, entry: etree._Element) -> Dict:
+        """Campos que necesita es_licitacion_tic: datos ATOM y códigos CPV"""
         data = {
-            'id_licitacion': self._get_text(entry, 'atom:id', ns),
-            'link': self._get_attr(entry, 'atom:link', 'href', ns),
-            'titulo': self._get_text(entry, 'atom:title', ns),
-            'resumen': self._get_text(entry, 'atom:summary', ns),
-            'fecha_actualizacion': self._get_text(entry, 'atom:updated', ns),
+            'id_licitacion': self._get_text(entry, 'atom_id'),
+            'link': self._get_attr(entry, 'atom_link', 'href'),
+            'titulo': self._get_text(entry, 'atom_title'),
+            'resumen': self._get_text(entry, 'atom_summary'),
+            'fecha_actualizacion': self._get_text(entry, 'atom_updated'),
         }
         
+        cfs = self._find(entry, 'cfs')
+        project = self._find(cfs, 'proyecto') if cfs is not None else None
+        if project is not None:
+            # Códigos CPV
+            data['codigos_cpv'] = [
+                elem.text
+                for clasificacion in project.iterchildren(self._Q_CLASIFICACION)
+                for elem in clasificacion.iterchildren(self._Q_CODIGO_CPV)
+                if elem.text
+            ]
+        
+        return data
+    
+    def _parse_entry_full(self, entry: etree._Element, data: Dict) -> None:
+        """Completa `data` con el resto del XML CODICE de la entrada"""
         # Buscar ContractFolderStatus
-        cfs = entry.find('.//cac-place-ext:ContractFolderStatus', ns)
+        cfs = self._find(entry, 'cfs')
         if cfs is not None:
             # Expediente
-            data['expediente'] = self._get_text(cfs, './/cbc:ContractFolderID', ns)
+            data['expediente'] = self._get_text(cfs, 'expediente')
             
             # Estado
-            data['estado'] = self._get_text(cfs, './/cbc-place-ext:ContractFolderStatusCode', ns)
+            data['estado'] = self._get_text(cfs, 'estado')
             
             # Órgano de contratación
-            party = cfs.find('.//cac-place-ext:LocatedContractingParty//cac:Party', ns)
+            party = self._find(cfs, 'organo')
             if party is not None:
-                data['organo_contratacion'] = self._get_text(party, './/cac:PartyName/cbc:Name', ns)
-                data['nif_organo'] = self._get_text(party, './/cac:PartyIdentification/cbc:ID[@schemeName="NIF"]', ns)
-                data['web_organo'] = self._get_text(party, './/cbc:WebsiteURI', ns)
-                data['email_organo'] = self._get_text(party, './/cac:Contact/cbc:ElectronicMail', ns)
-                data['telefono_organo'] = self._get_text(party, './/cac:Contact/cbc:Telephone', ns)
+                data['organo_contratacion'] = self._get_text(party, 'party_nombre')
+                data['nif_organo'] = self._get_text(party, 'organo_nif')
+                data['web_organo'] = self._get_text(party, 'organo_web')
+                data['email_organo'] = self._get_text(party, 'organo_email')
+                data['telefono_organo'] = self._get_text(party, 'organo_telefono')
                 
                 # Ubicación del órgano
-                address = party.find('.//cac:PostalAddress', ns)
+                address = self._find(party, 'organo_direccion')
                 if address is not None:
-                    data['ciudad_organo'] = self._get_text(address, './/cbc:CityName', ns)
-                    data['codigo_postal_organo'] = self._get_text(address, './/cbc:PostalZone', ns)
+                    data['ciudad_organo'] = self._get_text(address, 'ciudad')
+                    data['codigo_postal_organo'] = self._get_text(address, 'codigo_postal')
             
             # Proyecto de contratación
-            project = cfs.find('.//cac:ProcurementProject', ns)
+            project = self._find(cfs, 'proyecto')
             if project is not None:
                 # Tipo de contrato
-                type_code = self._get_text(project, './/cbc:TypeCode', ns)
-                tipos = {'1': 'Suministros', '2': 'Servicios', '3': 'Obras', 
-                        '7': 'Administrativo especial', '8': 'Privado',
-                        '21': 'Concesión de Servicios', '22': 'Concesión de Obras',
-                        '40': 'Patrimonial'}
-                data['tipo_contrato'] = tipos.get(type_code, f'Tipo {type_code}')
+                type_code = self._get_text(project, 'tipo_contrato')
+                data['tipo_contrato'] = self.TIPOS_CONTRATO.get(type_code) or f'Tipo {type_code}'
                 data['tipo_contrato_codigo'] = type_code
                 
-                # Códigos CPV
-                cpv_elements = project.findall('.//cac:RequiredCommodityClassification/cbc:ItemClassificationCode', ns)
-                data['codigos_cpv'] = [elem.text for elem in cpv_elements if elem.text]
-                
                 # Importes
-                budget = project.find('.//cac:BudgetAmount', ns)
+                budget = self._find(project, 'presupuesto')
                 if budget is not None:
-                    presupuesto = self._get_text(budget, './/cbc:TaxExclusiveAmount', ns)
-                    if presupuesto:
-                        try:
-                            data['presupuesto_base'] = float(presupuesto)
-                        except ValueError:
-                            pass
+                    presupuesto = self._get_float(budget, 'importe_sin_iva')
+                    if presupuesto is not None:
+                        data['presupuesto_base'] = presupuesto
                     
-                    valor_estimado = self._get_text(budget, './/cbc:EstimatedOverallContractAmount', ns)
-                    if valor_estimado:
-                        try:
-                            data['valor_estimado'] = float(valor_estimado)
-                        except ValueError:
-                            pass
+                    valor_estimado = self._get_float(budget, 'valor_estimado')
+                    if valor_estimado is not None:
+                        data['valor_estimado'] = valor_estimado
                 
                 # Lugar de ejecución
-                location = project.find('.//cac:RealizedLocation', ns)
+                location = self._find(project, 'lugar')
                 if location is not None:
-                    data['lugar_ejecucion'] = self._get_text(location, './/cbc:CountrySubentity', ns)
-                    data['codigo_nuts'] = self._get_text(location, './/cbc:CountrySubentityCode', ns)
+                    data['lugar_ejecucion'] = self._get_text(location, 'lugar_nombre')
+                    data['codigo_nuts'] = self._get_text(location, 'lugar_nuts')
                 
                 # Duración
-                duration = self._get_text(project, './/cac:PlannedPeriod/cbc:DurationMeasure', ns)
-                duration_unit = self._get_attr(project, './/cac:PlannedPeriod/cbc:DurationMeasure', 'unitCode', ns)
+                duration = self._get_text(project, 'duracion')
+                duration_unit = self._get_attr(project, 'duracion', 'unitCode')
                 if duration:
                     data['duracion'] = duration
                     data['duracion_unidad'] = duration_unit
             
             # Términos de licitación
-            terms = cfs.find('.//cac:TenderingTerms', ns)
+            terms = self._find(cfs, 'terminos')
             if terms is not None:
                 # Procedimiento
-                proc_code = self._get_text(terms, './/cbc:ProcedureCode', ns)
+                proc_code = self._get_text(terms, 'procedimiento')
                 data['procedimiento_codigo'] = proc_code
                 
                 # Financiación UE
-                funding = self._get_text(terms, './/cbc:FundingProgramCode', ns)
+                funding = self._get_text(terms, 'financiacion')
                 data['financiacion_ue'] = funding if funding and funding != 'NO-EU' else None
                 
                 # Fecha límite de presentación
-                deadline = self._get_text(terms, './/cac:TenderSubmissionDeadlinePeriod/cbc:EndDate', ns)
+                deadline = self._get_text(terms, 'fecha_limite')
                 if deadline:
                     data['fecha_limite_presentacion'] = deadline
                 
-                deadline_time = self._get_text(terms, './/cac:TenderSubmissionDeadlinePeriod/cbc:EndTime', ns)
+                deadline_time = self._get_text(terms, 'hora_limite')
                 if deadline_time:
                     data['hora_limite_presentacion'] = deadline_time
             
             # Resultado de adjudicación (si existe)
-            tender_result = cfs.find('.//cac:TenderResult', ns)
+            tender_result = self._find(cfs, 'resultado')
             if tender_result is not None:
-                result_code = self._get_text(tender_result, './/cbc:ResultCode', ns)
+                result_code = self._get_text(tender_result, 'resultado_codigo')
                 data['resultado_codigo'] = result_code
                 
-                award_date = self._get_text(tender_result, './/cbc:AwardDate', ns)
+                award_date = self._get_text(tender_result, 'fecha_adjudicacion')
                 if award_date:
                     data['fecha_adjudicacion'] = award_date
                 
                 # Adjudicatario
-                winner = tender_result.find('.//cac:WinningParty', ns)
+                winner = self._find(tender_result, 'adjudicatario')
                 if winner is not None:
-                    data['adjudicatario'] = self._get_text(winner, './/cac:PartyName/cbc:Name', ns)
-                    data['nif_adjudicatario'] = self._get_text(winner, './/cac:PartyIdentification/cbc:ID', ns)
+                    data['adjudicatario'] = self._get_text(winner, 'party_nombre')
+                    data['nif_adjudicatario'] = self._get_text(winner, 'adjudicatario_nif')
                 
                 # Importe de adjudicación
-                award_amount = self._get_text(tender_result, './/cbc:AwardedTenderedAmount', ns)
-                if award_amount:
-                    try:
-                        data['importe_adjudicacion'] = float(award_amount)
-                    except ValueError:
-                        pass
+                award_amount = self._get_float(tender_result, 'importe_adjudicacion')
+                if award_amount is not None:
+                    data['importe_adjudicacion'] = award_amount
             
             # DOCUMENTOS PDF
             documentos = []
             
-            # 1. Pliego de Cláusulas Administrativas (LegalDocumentReference)
-            legal_docs = cfs.findall('.//cac:LegalDocumentReference', ns)
-            for legal_doc in legal_docs:
-                nombre = self._get_text(legal_doc, './/cbc:ID', ns)
-                url = self._get_text(legal_doc, './/cbc:URI', ns)
-                
-                if url:
-                    documentos.append({
-                        'nombre': nombre if nombre else 'Pliego de Cláusulas Administrativas',
-                        'tipo': 'pliego_administrativo',
-                        'url': url
-                    })
-            
-            # 2. Pliego de Prescripciones Técnicas (TechnicalDocumentReference)
-            tech_docs = cfs.findall('.//cac:TechnicalDocumentReference', ns)
-            for tech_doc in tech_docs:
-                nombre = self._get_text(tech_doc, './/cbc:ID', ns)
-                url = self._get_text(tech_doc, './/cbc:URI', ns)
+            # Un único recorrido (en orden de documento) para los tres tipos de referencia:
+            # LegalDocumentReference (Pliego de Cláusulas Administrativas),
+            # TechnicalDocumentReference (Pliego de Prescripciones Técnicas) y
+            # GeneralDocumentDocumentReference (Documentos Generales)
+            for doc in self._XP['documentos'](cfs):
+                url = self._get_text(doc, 'doc_uri')
+                if not url:
+                    continue
                 
-                if url:
-                    documentos.append({
-                        'nombre': nombre if nombre else 'Pliego de Prescripciones Técnicas',
-                        'tipo': 'pliego_tecnico',
-                        'url': url
-                    })
-            
-            # 3. Documentos Generales (GeneralDocument)
-            general_docs = cfs.findall('.//cac-place-ext:GeneralDocument//cac-place-ext:GeneralDocumentDocumentReference', ns)
-            for gen_doc in general_docs:
-                nombre = self._get_text(gen_doc, './/cbc:ID', ns)
-                url = self._get_text(gen_doc, './/cbc:URI', ns)
-                tipo_code = self._get_text(gen_doc, './/cbc:DocumentTypeCode', ns)
+                nombre = self._get_text(doc, 'doc_id')
                 
-                if url:
+                if doc.tag == self._Q_DOC_LEGAL:
+                    nombre_defecto, tipo_doc = 'Pliego de Cláusulas Administrativas', 'pliego_administrativo'
+                elif doc.tag == self._Q_DOC_TECNICO:
+                    nombre_defecto, tipo_doc = 'Pliego de Prescripciones Técnicas', 'pliego_tecnico'
+                else:
                     # Determinar tipo según código
-                    tipo_doc = 'anexo'
-                    if tipo_code:
-                        if tipo_code == '1':
-                            tipo_doc = 'pliego_tecnico'
-                        elif tipo_code == '2':
-                            tipo_doc = 'pliego_administrativo'
-                    
-                    documentos.append({
-                        'nombre': nombre if nombre else 'Documento Anexo',
-                        'tipo': tipo_doc,
-                        'url': url
-                    })
+                    nombre_defecto, tipo_doc = 'Documento Anexo', 'anexo'
+                    tipo_code = self._get_text(doc, 'doc_tipo')
+                    if tipo_code == '1':
+                        tipo_doc = 'pliego_tecnico'
+                    elif tipo_code == '2':
+                        tipo_doc = 'pliego_administrativo'
+                
+                documentos.append({
+                    'nombre': nombre if nombre else nombre_defecto,
+                    'tipo': tipo_doc,
+                    'url': url
+                })
             
             if documentos:
                 data['documentos'] = documentos
-                logger.info(f"Encontrados {len(documentos)} documentos para: {data.get('titulo', '')[:50]}")
-        
-        return data
+                logger.info("Encontrados %d documentos para: %.50s", len(documentos), data.get('titulo'))
     
-    def _get_text(self, element: etree._Element, xpath: str, namespaces: Dict) -> Optional[str]:
-        """Obtiene el texto de un elemento usando XPath"""
-        try:
-            elem = element.find(xpath, namespaces)
-            return elem.text.strip() if elem is not None and elem.text else None
-        except Exception:
-            return None
+    def _find(self, element: etree._Element, clave: str) -> Optional[etree._Element]:
+        """Primer elemento que devuelve la XPath precompilada `clave`"""
+        resultado = self._XP[clave](element)
+        return resultado[0] if resultado else None
+    
+    def _get_text(self, element: etree._Element, clave: str) -> Optional[str]:
+        """Obtiene el texto de un elemento usando una XPath precompilada"""
+        elem = self._find(element, clave)
+        return elem.text.strip() if elem is not None and elem.text else None
     
-    def _get_attr(self, element: etree._Element, xpath: str, attr: str, namespaces: Dict) -> Optional[str]:
-        """Obtiene un atributo de un elemento usando XPath"""
+    def _get_float(self, element: etree._Element, clave: str) -> Optional[float]:
+        """Obtiene un importe numérico; None si falta o no es un número"""
+        texto = self._get_text(element, clave)
+        if not texto:
+            return None
         try:
-            elem = element.find(xpath, namespaces)
-            return elem.get(attr) if elem is not None else None
-        except Exception:
+            return float(texto)
+        except ValueError:
             return None
     
+    def _get_attr(self, element: etree._Element, clave: str, attr: str) -> Optional[str]:
+        """Obtiene un atributo de un elemento usando una XPath precompilada"""
+        elem = self._find(element, clave)
+        return elem.get(attr) if elem is not None else None
+    
     def es_licitacion_tic(self, licitacion: Dict) -> bool:
         """Determina si una licitación es relevante para el sector TIC"""
+        # Logs con formato diferido: en producción (INFO) no se formatea nada por entrada
         # Filtro 1: Por código CPV
         codigos_cpv = licitacion.get('codigos_cpv', [])
         for cpv in codigos_cpv:
-            for cpv_tic in self.CPV_TIC:
-                if cpv.startswith(cpv_tic):
-                    logger.debug(f"Licitación TIC por CPV {cpv}: {licitacion.get('titulo', '')[:50]}")
-                    return True
+            if cpv.startswith(self.CPV_TIC):
+                logger.debug("Licitación TIC por CPV %s: %.50s", cpv, licitacion.get('titulo'))
+                return True
         
         # Filtro 2: Por keywords en título
-        titulo = licitacion.get('titulo', '').lower()
-        for keyword in self.KEYWORDS_TIC:
-            if keyword in titulo:
-                logger.debug(f"Licitación TIC por keyword '{keyword}' en título")
-                return True
+        titulo = (licitacion.get('titulo') or '').lower()
+        match = self._KEYWORDS_RE.search(titulo)
+        if match:
+            logger.debug("Licitación TIC por keyword '%s' en título", match.group())
+            return True
         
         # Filtro 3: Por keywords en resumen
-        resumen = licitacion.get('resumen', '').lower()
-        for keyword in self.KEYWORDS_TIC:
-            if keyword in resumen:
-                logger.debug(f"Licitación TIC por keyword '{keyword}' en resumen")
-                return True
+        resumen = (licitacion.get('resumen') or '').lower()
+        match = self._KEYWORDS_RE.search(resumen)
+        if match:
+            logger.debug("Licitación TIC por keyword '%s' en resumen", match.group())
+            return True
         
         return False
     
-    def scrape_feed_page(self, url: str, filtrar_tic: bool = True) -> tuple[List[Dict], Optional[str]]:
-        """Scrape una página del feed ATOM"""
-        root = self.fetch_feed_xml(url)
-        ns = self.NAMESPACES
+    def scrape_feed_page(
+        self,
+        url: str,
+        filtrar_tic: bool = True,
+        desde: Optional[datetime] = None
+    ) -> tuple[List[Dict], Optional[str]]:
+        """
+        Scrape una página del feed ATOM
         
-        # Obtener todas las entradas
-        entries = root.findall('.//atom:entry', ns)
-        logger.info(f"Encontradas {len(entries)} entradas en el feed")
+        Si se indica `desde`, el recorrido se corta en la primera entrada
+        actualizada antes de esa fecha (el feed va de más reciente a más
+        antigua): no se parsea el resto de la página ni se pide la siguiente.
+        """
+        siguiente = [None]
+        total = 0
         
         licitaciones = []
-        for entry in entries:
-            licitacion = self.parse_entry(entry)
+        for entry in self._iter_entries(url, siguiente):
+            total += 1
+            # Primero solo lo necesario para el filtro TIC; el resto del XML
+            # únicamente para las entradas que lo pasan
+            licitacion = self._parse_entry_minimal(entry)
+            
+            if desde is not None:
+                fecha = self._parse_fecha(licitacion.get('fecha_actualizacion'))
+                if fecha is not None and fecha < desde:
+                    logger.info(f"Alcanzada fecha límite: {fecha}")
+                    siguiente[0] = None
+                    break
             
             # Filtrar por TIC si se solicita
             if filtrar_tic and not self.es_licitacion_tic(licitacion):
                 continue
             
+            self._parse_entry_full(entry, licitacion)
             licitaciones.append(licitacion)
         
-        # Obtener URL de siguiente página
-        next_url = None
-        next_link = root.find('.//atom:link[@rel="next"]', ns)
-        if next_link is not None:
-            next_url = next_link.get('href')
+        # URL de siguiente página (leída del propio feed durante el parseo)
+        next_url = siguiente[0]
         
-        logger.info(f"Scraped {len(licitaciones)} licitaciones TIC de {len(entries)} totales")
+        logger.info(f"Scraped {len(licitaciones)} licitaciones TIC de {total} totales")
         
         return licitaciones, next_url
     
-    def scrape_all(self, max_pages: Optional[int] = None, filtrar_tic: bool = True) -> Generator[Dict, None, None]:
-        """Scrape todas las páginas del feed siguiendo la paginación"""
-        url = self.BASE_FEED_URL
+    def scrape_all(
+        self,
+        max_pages: Optional[int] = None,
+        filtrar_tic: bool = True,
+        desde: Optional[datetime] = None
+    ) -> Generator[Dict, None, None]:
+        """Scrape todas las páginas del feed siguiendo la paginación (hasta `desde` si se indica)"""
         page = 0
         
-        while url:
-            page += 1
-            logger.info(f"Scraping página {page}...")
+        # La URL de la página N+1 solo se conoce al leer la N (enlaces opacos),
+        # así que la siguiente página se descarga y parsea en segundo plano
+        # mientras el consumidor procesa la actual
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(self.scrape_feed_page, self.BASE_FEED_URL, filtrar_tic, desde)
             
-            try:
-                licitaciones, next_url = self.scrape_feed_page(url, filtrar_tic=filtrar_tic)
+            while future is not None:
+                page += 1
+                logger.info(f"Scraping página {page}...")
                 
-                for licitacion in licitaciones:
-                    yield licitacion
+                try:
+                    licitaciones, next_url = future.result()
+                except Exception as e:
+                    logger.error(f"Error scraping página {page}: {e}")
+                    break
+                
+                future = None
                 
                 # Verificar si continuar
                 if max_pages and page >= max_pages:
                     logger.info(f"Alcanzado límite de {max_pages} páginas")
-                    break
-                
-                url = next_url
-                
-                if not url:
+                elif not next_url:
                     logger.info("No hay más páginas")
-                    break
-            
-            except Exception as e:
-                logger.error(f"Error scraping página {page}: {e}")
-                break
+                else:
+                    future = executor.submit(self.scrape_feed_page, next_url, filtrar_tic, desde)
+                
+                for licitacion in licitaciones:
+                    yield licitacion
+        finally:
+            # Cancelar la página precargada si el consumidor deja de iterar
+            executor.shutdown(wait=False, cancel_futures=True)
     
     def scrape_recent(self, days: int = 7, filtrar_tic: bool = True) -> List[Dict]:
         """Scrape licitaciones recientes de los últimos N días"""
-        cutoff_date = datetime.now() - timedelta(days=days)
-        licitaciones = []
+        # Con zona horaria: las fechas del feed llevan offset (+01:00 en invierno, +02:00 en verano)
+        cutoff_date = datetime.now().astimezone() - timedelta(days=days)
         
-        for licitacion in self.scrape_all(max_pages=50, filtrar_tic=filtrar_tic):
-            # Parsear fecha de actualización
-            fecha_str = licitacion.get('fecha_actualizacion', '')
-            try:
-                # Formato: 2025-10-15T17:00:00.008+02:00
-                fecha = datetime.fromisoformat(fecha_str.replace('+02:00', '').replace('+01:00', ''))
-                
-                if fecha < cutoff_date:
-                    logger.info(f"Alcanzada fecha límite: {fecha}")
-                    break
-                
-                licitaciones.append(licitacion)
-            except Exception as e:
-                logger.warning(f"Error parseando fecha: {fecha_str} - {e}")
-                licitaciones.append(licitacion)
+        # El corte por fecha se hace al parsear cada página: las entradas antiguas
+        # ni se parsean enteras ni provocan la descarga de más páginas
+        licitaciones = list(self.scrape_all(max_pages=50, filtrar_tic=filtrar_tic, desde=cutoff_date))
         
         logger.info(f"Scraped {len(licitaciones)} licitaciones de los últimos {days} días")
         return licitaciones
+    
+    def _parse_fecha(self, fecha_str: Optional[str]) -> Optional[datetime]:
+        """Fecha de actualización de una entrada con zona horaria; None si no se puede parsear"""
+        try:
+            # Formato: 2025-10-15T17:00:00.008+02:00 (fromisoformat entiende el offset)
+            fecha = datetime.fromisoformat(fecha_str)
+        except Exception as e:
+            # Si no podemos parsear la fecha, la entrada se incluye por seguridad
+            logger.warning(f"Error parseando fecha: {fecha_str} - {e}")
+            return None
+        return fecha if fecha.tzinfo is not None else fecha.astimezone()
 
 
 def main():
@@ -2,32 +2,370 @@
 Servicio de análisis con IA usando OpenAI (versión con requests directos)
 """
 import requests
+from requests.adapters import HTTPAdapter
+from app.core.cache import get_redis
 from app.core.config import settings
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
 import logging
-import json
+import orjson
 import hashlib
+import random
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Sesión HTTP compartida (lazy initialization): reutiliza las conexiones TLS con OpenAI
+_session = None
+
+def get_openai_session() -> requests.Session:
+    """Sesión de requests con pool de conexiones keep-alive hacia la API de OpenAI"""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        # Los análisis concurrentes (hilos de TitulosAdaptadosService y de
+        # analizar_licitacion_completa) comparten el pool
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=16))
+        _session = session
+    return _session
+
 
 class AIService:
     """Servicio para análisis de licitaciones con IA"""
     
-    def __init__(self):
+    MAX_PLIEGO_CHARS = 15000  # ~4000 tokens de pliego por petición
+    MEMORY_CACHE_SIZE = 1000  # Respuestas en la caché LRU en memoria (el resto, en Redis)
+    BATCHES_KEY = "ai:batches"  # Hash de Redis con los batches en curso (batch_id -> registro)
+    
+    # Prompts de sistema fijos, siempre como primer mensaje: el prefijo idéntico entre
+    # peticiones permite a OpenAI servirlo desde su caché de prompts
+    PROMPT_STACK = """Eres un experto en tecnología que analiza licitaciones públicas de TIC.
+Tu tarea es identificar el stack tecnológico mencionado en la licitación.
+
+Debes extraer y categorizar las tecnologías en estas categorías:
+- lenguajes_programacion: Python, Java, JavaScript, C#, PHP, etc.
+- frameworks: React, Angular, Vue, Django, Spring, .NET, etc.
+- bases_datos: PostgreSQL, MySQL, MongoDB, Oracle, SQL Server, etc.
+- cloud: AWS, Azure, Google Cloud, DigitalOcean, etc.
+- devops: Docker, Kubernetes, Jenkins, GitLab CI, Terraform, etc.
+- otros: Cualquier otra tecnología relevante
+
+Responde SOLO con un JSON válido con esta estructura:
+{
+  "lenguajes_programacion": ["Python", "JavaScript"],
+  "frameworks": ["Django", "React"],
+  "bases_datos": ["PostgreSQL"],
+  "cloud": ["AWS"],
+  "devops": ["Docker", "Kubernetes"],
+  "otros": ["Elasticsearch", "Redis"]
+}
+
+Si no encuentras tecnologías en alguna categoría, devuelve un array vacío [].
+NO incluyas explicaciones, SOLO el JSON."""
+
+    PROMPT_CONCEPTOS = """Eres un experto en tecnología que clasifica licitaciones públicas de TIC.
+Tu tarea es identificar los conceptos TIC principales de la licitación.
+
+Conceptos disponibles:
+- Ciberseguridad
+- Inteligencia Artificial / Machine Learning
+- Cloud Computing
+- Big Data / Analítica
+- DevOps / CI/CD
+- Desarrollo Web
+- Desarrollo Móvil
+- ERP / CRM
+- Infraestructura TI
+- Redes y Telecomunicaciones
+- Virtualización
+- Bases de Datos
+- Business Intelligence
+- IoT (Internet de las Cosas)
+- Blockchain
+- Transformación Digital
+- Migración / Modernización
+- Soporte y Mantenimiento
+- Consultoría TI
+- Formación TIC
+
+Responde SOLO con un JSON válido con esta estructura:
+{
+  "conceptos": ["Ciberseguridad", "Cloud Computing", "DevOps / CI/CD"]
+}
+
+Selecciona entre 1 y 5 conceptos que mejor describan la licitación.
+NO incluyas explicaciones, SOLO el JSON."""
+
+    PROMPT_RESUMEN = """Eres un experto en tecnología que analiza licitaciones públicas de TIC.
+Tu tarea es generar un resumen técnico claro y conciso de la licitación.
+
+El resumen debe incluir:
+- objetivo: Qué se quiere conseguir con esta licitación (1-2 frases)
+- requisitos_clave: Lista de 3-5 requisitos técnicos principales
+- complejidad: "Baja", "Media" o "Alta"
+- duracion_estimada: Duración estimada del proyecto (ej: "6 meses", "1 año")
+- presupuesto_tipo: "Pequeño" (<50k), "Mediano" (50k-200k) o "Grande" (>200k)
+
+Responde SOLO con un JSON válido con esta estructura:
+{
+  "objetivo": "Implementar un sistema de gestión documental basado en cloud",
+  "requisitos_clave": [
+    "Integración con sistemas existentes",
+    "Alta disponibilidad y escalabilidad",
+    "Cumplimiento RGPD"
+  ],
+  "complejidad": "Media",
+  "duracion_estimada": "8 meses",
+  "presupuesto_tipo": "Mediano"
+}
+
+NO incluyas explicaciones, SOLO el JSON."""
+
+    PROMPT_TITULO_ADAPTADO = """Eres un experto en redacción que adapta títulos de licitaciones públicas.
+
+Tu tarea es convertir títulos largos y burocráticos en títulos más naturales, concisos y fáciles de leer.
+
+Reglas:
+1. Máximo 80 caracteres
+2. Eliminar redundancias y jerga burocrática
+3. Mantener la información esencial: qué se contrata y para qué
+4. Usar lenguaje natural y directo
+5. NO incluir códigos, expedientes ni referencias administrativas
+6. Responder SOLO con el título adaptado, sin comillas ni explicaciones
+
+Ejemplos:
+
+Original: "Servicio de mantenimiento correctivo y evolutivo del sistema de información de gestión económica y presupuestaria del Ayuntamiento de Madrid para el ejercicio 2025"
+Adaptado: "Mantenimiento del sistema de gestión económica del Ayuntamiento de Madrid"
+
+Original: "Contrato de servicios para el desarrollo, implantación y mantenimiento de una plataforma digital de tramitación telemática basada en tecnologías cloud"
+Adaptado: "Desarrollo de plataforma digital de tramitación en la nube"
+
+Original: "Suministro e instalación de equipamiento informático y licencias de software para la modernización de la infraestructura TI"
+Adaptado: "Equipamiento informático y licencias para modernización TI"""
+
+    PROMPT_ANALISIS_COMPLETO = """Eres un experto en tecnología que analiza licitaciones públicas de TIC.
+Tu tarea es analizar la licitación y devolver cuatro resultados en un único JSON.
+
+1. titulo_adaptado: el título reescrito de forma natural, concisa y fácil de leer.
+   - Máximo 80 caracteres
+   - Eliminar redundancias y jerga burocrática
+   - Mantener la información esencial: qué se contrata y para qué
+   - NO incluir códigos, expedientes ni referencias administrativas
+   Ejemplo: "Servicio de mantenimiento correctivo y evolutivo del sistema de información de gestión económica y presupuestaria del Ayuntamiento de Madrid para el ejercicio 2025"
+   -> "Mantenimiento del sistema de gestión económica del Ayuntamiento de Madrid"
+
+2. stack_tecnologico: tecnologías mencionadas, en estas categorías:
+   - lenguajes_programacion: Python, Java, JavaScript, C#, PHP, etc.
+   - frameworks: React, Angular, Vue, Django, Spring, .NET, etc.
+   - bases_datos: PostgreSQL, MySQL, MongoDB, Oracle, SQL Server, etc.
+   - cloud: AWS, Azure, Google Cloud, DigitalOcean, etc.
+   - devops: Docker, Kubernetes, Jenkins, GitLab CI, Terraform, etc.
+   - otros: Cualquier otra tecnología relevante
+   Si no encuentras tecnologías en alguna categoría, devuelve un array vacío [].
+
+3. conceptos_tic: entre 1 y 5 conceptos que mejor describan la licitación, elegidos de:
+   Ciberseguridad, Inteligencia Artificial / Machine Learning, Cloud Computing,
+   Big Data / Analítica, DevOps / CI/CD, Desarrollo Web, Desarrollo Móvil, ERP / CRM,
+   Infraestructura TI, Redes y Telecomunicaciones, Virtualización, Bases de Datos,
+   Business Intelligence, IoT (Internet de las Cosas), Blockchain, Transformación Digital,
+   Migración / Modernización, Soporte y Mantenimiento, Consultoría TI, Formación TIC
+
+4. resumen_tecnico: resumen técnico claro y conciso con:
+   - objetivo: Qué se quiere conseguir con esta licitación (1-2 frases)
+   - requisitos_clave: Lista de 3-5 requisitos técnicos principales
+   - complejidad: "Baja", "Media" o "Alta"
+   - duracion_estimada: Duración estimada del proyecto (ej: "6 meses", "1 año")
+   - presupuesto_tipo: "Pequeño" (<50k), "Mediano" (50k-200k) o "Grande" (>200k)
+
+Responde SOLO con un JSON válido con esta estructura:
+{
+  "titulo_adaptado": "Desarrollo de plataforma digital de tramitación en la nube",
+  "stack_tecnologico": {
+    "lenguajes_programacion": ["Java"],
+    "frameworks": ["Spring"],
+    "bases_datos": ["PostgreSQL"],
+    "cloud": ["Azure"],
+    "devops": ["Docker"],
+    "otros": []
+  },
+  "conceptos_tic": ["Desarrollo Web", "Cloud Computing"],
+  "resumen_tecnico": {
+    "objetivo": "Implementar una plataforma de tramitación telemática en la nube",
+    "requisitos_clave": ["Integración con sistemas existentes", "Cumplimiento RGPD"],
+    "complejidad": "Media",
+    "duracion_estimada": "12 meses",
+    "presupuesto_tipo": "Grande"
+  }
+}
+
+NO incluyas explicaciones, SOLO el JSON."""
+    
+    def __init__(self, usar_batch: Optional[bool] = None):
         self.api_key = settings.OPENAI_API_KEY
         self.model = settings.OPENAI_MODEL
+        # Modelo pequeño para tareas simples (título, conceptos) y grande para el pliego
+        self.model_small = settings.OPENAI_MODEL_SMALL or self.model
+        self.model_large = settings.OPENAI_MODEL_LARGE or self.model
         self.temperature = settings.OPENAI_TEMPERATURE
         self.max_tokens = settings.OPENAI_MAX_TOKENS
-        self.api_url = "https://api.openai.com/v1/chat/completions"
-        self._cache = {}  # Cache simple en memoria
+        self.api_base = "https://api.openai.com/v1"
+        self.api_url = f"{self.api_base}/chat/completions"
+        self._cache = OrderedDict()  # Cache LRU en memoria (por instancia)
+        self._cache_lock = threading.Lock()  # Compartida por los hilos de los análisis concurrentes
+        self.cache_ttl = 86400 * settings.AI_CACHE_TTL_DAYS  # Cache compartida en Redis
+        self.max_rpm = settings.OPENAI_MAX_RPM
+        self.max_retries = settings.OPENAI_MAX_RETRIES
+        # Batch API para los análisis en segundo plano (mitad de precio, hasta 24h)
+        self.usar_batch = settings.OPENAI_USE_BATCH_API if usar_batch is None else usar_batch
+        self.batch_max_wait = 3600 * settings.OPENAI_BATCH_MAX_WAIT_HOURS
+    
+    def _get_cache_key(self, text: str, prompt_type: str, model: Optional[str] = None) -> str:
+        """Genera una clave de caché basada en el hash del texto y el modelo"""
+        # Mismo digest que hashear f"{modelo}||{texto}" sin construir la cadena concatenada
+        hasher = hashlib.blake2b((model or self.model).encode(), digest_size=16)
+        hasher.update(b"||")
+        hasher.update(text.encode())
+        return f"ai:{prompt_type}:{hasher.hexdigest()}"
+    
+    def _get_cached(self, cache_key: str) -> Optional[str]:
+        """Busca la respuesta en memoria y después en Redis"""
+        with self._cache_lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                return cached
+        
+        redis_client = get_redis()
+        if redis_client is None:
+            return None
+        try:
+            cached = redis_client.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Error leyendo caché de IA en Redis: {e}")
+            return None
+        if cached is not None:
+            self._guardar_en_memoria(cache_key, cached)
+        return cached
+    
+    def _guardar_en_memoria(self, cache_key: str, result: str) -> None:
+        """Guarda en la caché LRU, descartando la entrada menos usada si está llena"""
+        with self._cache_lock:
+            self._cache[cache_key] = result
+            self._cache.move_to_end(cache_key)
+            if len(self._cache) > self.MEMORY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+    
+    def _set_cached(self, cache_key: str, result: str) -> None:
+        """Guarda la respuesta en memoria y en Redis durante AI_CACHE_TTL_DAYS"""
+        self._guardar_en_memoria(cache_key, result)
+        
+        redis_client = get_redis()
+        if redis_client is None:
+            return
+        try:
+            redis_client.setex(cache_key, self.cache_ttl, result)
+        except Exception as e:
+            logger.warning(f"Error guardando caché de IA en Redis: {e}")
+    
+    def _esperar_turno(self) -> None:
+        """
+        Limita las peticiones a OpenAI a OPENAI_MAX_RPM por minuto
+        
+        Contador por ventana de un minuto en Redis (INCR + EXPIRE), compartido por
+        todos los hilos y workers. Sin Redis no se limita (el 429 lo cubre el backoff).
+        """
+        redis_client = get_redis()
+        if redis_client is None:
+            return
+        
+        while True:
+            ahora = time.time()
+            clave = f"ai:rpm:{int(ahora // 60)}"
+            try:
+                pipe = redis_client.pipeline()
+                pipe.incr(clave)
+                pipe.expire(clave, 61)
+                usadas, _ = pipe.execute()
+            except Exception as e:
+                logger.warning(f"Error en el limitador de OpenAI en Redis: {e}")
+                return
+            
+            if usadas <= self.max_rpm:
+                return
+            
+            # Cuota del minuto agotada: esperar a la siguiente ventana
+            time.sleep(60 - ahora % 60 + random.uniform(0, 1))
     
-    def _get_cache_key(self, text: str, prompt_type: str) -> str:
-        """Genera una clave de caché basada en el hash del texto"""
-        content = f"{prompt_type}:{text}"
-        return hashlib.md5(content.encode()).hexdigest()
+    def _post_con_reintentos(self, headers: Dict, payload: Dict) -> Optional[requests.Response]:
+        """
+        POST a la API de OpenAI con backoff exponencial ante 429 y errores 5xx
+        
+        Returns:
+            Respuesta de la API (puede ser un error no reintentable) o None si se agotan los reintentos
+        """
+        for intento in range(self.max_retries):
+            self._esperar_turno()
+            
+            try:
+                response = get_openai_session().post(
+                    self.api_url,
+                    headers=headers,
+                    data=orjson.dumps(payload),
+                    timeout=60
+                )
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                logger.warning(f"Error de red llamando a OpenAI (intento {intento + 1}/{self.max_retries}): {e}")
+                response = None
+            
+            if response is not None and response.status_code not in (429, 500, 502, 503, 504):
+                return response
+            
+            if intento < self.max_retries - 1:
+                # Respetar Retry-After si OpenAI lo indica; si no, backoff exponencial con jitter
+                espera = 2 ** intento + random.uniform(0, 1)
+                if response is not None:
+                    try:
+                        espera = max(espera, float(response.headers.get('Retry-After', 0)))
+                    except ValueError:
+                        pass
+                    logger.warning(f"OpenAI respondió {response.status_code}, reintentando en {espera:.1f}s")
+                time.sleep(espera)
+        
+        logger.error(f"No se pudo llamar a OpenAI después de {self.max_retries} intentos")
+        return None
+    
+    def _construir_payload(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        model: Optional[str] = None
+    ) -> Dict:
+        """Cuerpo de la petición a chat/completions"""
+        payload = {
+            "model": model or self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        return payload
     
-    def _call_openai(self, system_prompt: str, user_prompt: str, cache_key: Optional[str] = None) -> Optional[str]:
+    def _call_openai(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        cache_key: Optional[str] = None,
+        json_mode: bool = False,
+        model: Optional[str] = None
+    ) -> Optional[str]:
         """
         Llama a la API de OpenAI usando requests directamente
         
@@ -35,14 +373,18 @@ class AIService:
             system_prompt: Prompt del sistema
             user_prompt: Prompt del usuario
             cache_key: Clave de caché opcional
+            json_mode: Fuerza a que la respuesta sea un objeto JSON válido
+            model: Modelo a usar (por defecto OPENAI_MODEL)
             
         Returns:
             Respuesta de la IA o None si falla
         """
-        # Verificar caché
-        if cache_key and cache_key in self._cache:
-            logger.debug(f"Usando respuesta cacheada para {cache_key}")
-            return self._cache[cache_key]
+        # Verificar caché (memoria y Redis): evita la llamada a OpenAI
+        if cache_key:
+            cached = self._get_cached(cache_key)
+            if cached is not None:
+                logger.debug(f"Usando respuesta cacheada para {cache_key}")
+                return cached
         
         try:
             headers = {
@@ -50,37 +392,28 @@ class AIService:
                 "Content-Type": "application/json"
             }
             
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": self.temperature,
-                "max_tokens": self.max_tokens
-            }
+            payload = self._construir_payload(system_prompt, user_prompt, json_mode, model)
             
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
+            response = self._post_con_reintentos(headers, payload)
+            
+            if response is None:
+                return None
             
             if response.status_code != 200:
                 logger.error(f"Error en API de OpenAI: {response.status_code} - {response.text}")
                 return None
             
-            result_data = response.json()
+            result_data = orjson.loads(response.content)
             result = result_data['choices'][0]['message']['content']
             
-            # Log de uso de tokens
-            usage = result_data.get('usage', {})
-            logger.info(f"Tokens usados - Input: {usage.get('prompt_tokens', 0)}, Output: {usage.get('completion_tokens', 0)}, Total: {usage.get('total_tokens', 0)}")
+            # Log de uso de tokens (Cacheados: prefijo servido por la caché de prompts de OpenAI)
+            usage = result_data.get('usage') or {}
+            cacheados = (usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0)
+            logger.info(f"Tokens usados - Input: {usage.get('prompt_tokens', 0)} (Cacheados: {cacheados}), Output: {usage.get('completion_tokens', 0)}, Total: {usage.get('total_tokens', 0)}")
             
             # Guardar en caché
             if cache_key:
-                self._cache[cache_key] = result
+                self._set_cached(cache_key, result)
             
             return result
         
@@ -100,54 +433,26 @@ class AIService:
         Returns:
             Diccionario con stack tecnológico identificado
         """
-        system_prompt = """Eres un experto en tecnología que analiza licitaciones públicas de TIC.
-Tu tarea es identificar el stack tecnológico mencionado en la licitación.
-
-Debes extraer y categorizar las tecnologías en estas categorías:
-- lenguajes_programacion: Python, Java, JavaScript, C#, PHP, etc.
-- frameworks: React, Angular, Vue, Django, Spring, .NET, etc.
-- bases_datos: PostgreSQL, MySQL, MongoDB, Oracle, SQL Server, etc.
-- cloud: AWS, Azure, Google Cloud, DigitalOcean, etc.
-- devops: Docker, Kubernetes, Jenkins, GitLab CI, Terraform, etc.
-- otros: Cualquier otra tecnología relevante
-
-Responde SOLO con un JSON válido con esta estructura:
-{
-  "lenguajes_programacion": ["Python", "JavaScript"],
-  "frameworks": ["Django", "React"],
-  "bases_datos": ["PostgreSQL"],
-  "cloud": ["AWS"],
-  "devops": ["Docker", "Kubernetes"],
-  "otros": ["Elasticsearch", "Redis"]
-}
-
-Si no encuentras tecnologías en alguna categoría, devuelve un array vacío [].
-NO incluyas explicaciones, SOLO el JSON."""
-
-        # Construir texto a analizar
-        texto_analizar = f"Título: {titulo}\n\nDescripción: {descripcion}"
-        
-        if texto_pliego:
-            # Limitar el texto del pliego para no exceder límites de tokens
-            texto_pliego_limitado = texto_pliego[:15000]  # ~4000 tokens aprox
-            texto_analizar += f"\n\nPliego técnico:\n{texto_pliego_limitado}"
+        texto_analizar = self._construir_texto_analizar(titulo, descripcion, texto_pliego)
         
-        cache_key = self._get_cache_key(texto_analizar, "stack")
+        # Solo el pliego completo justifica el modelo grande
+        model = self.model_large if texto_pliego else self.model_small
+        cache_key = self._get_cache_key(texto_analizar, "stack", model)
         
-        response = self._call_openai(system_prompt, texto_analizar, cache_key)
+        response = self._call_openai(self.PROMPT_STACK, texto_analizar, cache_key, model=model)
         
         if not response:
             return None
         
         try:
             # Parsear JSON
-            stack = json.loads(response)
+            stack = orjson.loads(response)
             
             logger.info(f"Stack tecnológico identificado: {sum(len(v) for v in stack.values())} tecnologías")
             
             return stack
         
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"Error parseando respuesta JSON: {e}\nRespuesta: {response}")
             return None
     
@@ -163,64 +468,25 @@ NO incluyas explicaciones, SOLO el JSON."""
         Returns:
             Lista de conceptos TIC identificados
         """
-        system_prompt = """Eres un experto en tecnología que clasifica licitaciones públicas de TIC.
-Tu tarea es identificar los conceptos TIC principales de la licitación.
-
-Conceptos disponibles:
-- Ciberseguridad
-- Inteligencia Artificial / Machine Learning
-- Cloud Computing
-- Big Data / Analítica
-- DevOps / CI/CD
-- Desarrollo Web
-- Desarrollo Móvil
-- ERP / CRM
-- Infraestructura TI
-- Redes y Telecomunicaciones
-- Virtualización
-- Bases de Datos
-- Business Intelligence
-- IoT (Internet de las Cosas)
-- Blockchain
-- Transformación Digital
-- Migración / Modernización
-- Soporte y Mantenimiento
-- Consultoría TI
-- Formación TIC
-
-Responde SOLO con un JSON válido con esta estructura:
-{
-  "conceptos": ["Ciberseguridad", "Cloud Computing", "DevOps / CI/CD"]
-}
-
-Selecciona entre 1 y 5 conceptos que mejor describan la licitación.
-NO incluyas explicaciones, SOLO el JSON."""
-
-        # Construir texto a analizar
-        texto_analizar = f"Título: {titulo}\n\nDescripción: {descripcion}"
+        texto_analizar = self._construir_texto_analizar(titulo, descripcion, texto_pliego)
         
-        if texto_pliego:
-            # Limitar el texto del pliego para no exceder límites de tokens
-            texto_pliego_limitado = texto_pliego[:15000]  # ~4000 tokens aprox
-            texto_analizar += f"\n\nPliego técnico:\n{texto_pliego_limitado}"
+        cache_key = self._get_cache_key(texto_analizar, "conceptos", self.model_small)
         
-        cache_key = self._get_cache_key(texto_analizar, "conceptos")
-        
-        response = self._call_openai(system_prompt, texto_analizar, cache_key)
+        response = self._call_openai(self.PROMPT_CONCEPTOS, texto_analizar, cache_key, model=self.model_small)
         
         if not response:
             return None
         
         try:
             # Parsear JSON
-            result = json.loads(response)
+            result = orjson.loads(response)
             conceptos = result.get('conceptos', [])
             
             logger.info(f"Conceptos TIC identificados: {len(conceptos)}")
             
             return conceptos
         
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"Error parseando respuesta JSON: {e}\nRespuesta: {response}")
             return None
     
@@ -236,66 +502,38 @@ NO incluyas explicaciones, SOLO el JSON."""
         Returns:
             Diccionario con resumen técnico
         """
-        system_prompt = """Eres un experto en tecnología que analiza licitaciones públicas de TIC.
-Tu tarea es generar un resumen técnico claro y conciso de la licitación.
-
-El resumen debe incluir:
-- objetivo: Qué se quiere conseguir con esta licitación (1-2 frases)
-- requisitos_clave: Lista de 3-5 requisitos técnicos principales
-- complejidad: "Baja", "Media" o "Alta"
-- duracion_estimada: Duración estimada del proyecto (ej: "6 meses", "1 año")
-- presupuesto_tipo: "Pequeño" (<50k), "Mediano" (50k-200k) o "Grande" (>200k)
-
-Responde SOLO con un JSON válido con esta estructura:
-{
-  "objetivo": "Implementar un sistema de gestión documental basado en cloud",
-  "requisitos_clave": [
-    "Integración con sistemas existentes",
-    "Alta disponibilidad y escalabilidad",
-    "Cumplimiento RGPD"
-  ],
-  "complejidad": "Media",
-  "duracion_estimada": "8 meses",
-  "presupuesto_tipo": "Mediano"
-}
-
-NO incluyas explicaciones, SOLO el JSON."""
-
-        # Construir texto a analizar
-        texto_analizar = f"Título: {titulo}\n\nDescripción: {descripcion}"
-        
-        if texto_pliego:
-            # Limitar el texto del pliego
-            texto_pliego_limitado = texto_pliego[:15000]
-            texto_analizar += f"\n\nPliego técnico:\n{texto_pliego_limitado}"
+        texto_analizar = self._construir_texto_analizar(titulo, descripcion, texto_pliego)
         
-        cache_key = self._get_cache_key(texto_analizar, "resumen")
+        cache_key = self._get_cache_key(texto_analizar, "resumen", self.model_large)
         
-        response = self._call_openai(system_prompt, texto_analizar, cache_key)
+        response = self._call_openai(self.PROMPT_RESUMEN, texto_analizar, cache_key, model=self.model_large)
         
         if not response:
             return None
         
         try:
             # Parsear JSON
-            resumen = json.loads(response)
+            resumen = orjson.loads(response)
             
             logger.info(f"Resumen técnico generado: {resumen.get('complejidad')} complejidad")
             
             return resumen
         
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"Error parseando respuesta JSON: {e}\nRespuesta: {response}")
             return None
     
-    def analizar_licitacion_completa(
+    def analizar_todo_en_una_llamada(
         self,
         titulo: str,
         descripcion: str,
         texto_pliego: Optional[str] = None
     ) -> Optional[Dict]:
         """
-        Realiza un análisis completo de una licitación
+        Obtiene título adaptado, stack, conceptos y resumen en una sola petición
+        
+        El título, la descripción y el pliego se envían una única vez en lugar de
+        una por análisis, con la respuesta forzada a JSON (response_format).
         
         Args:
             titulo: Título de la licitación
@@ -303,22 +541,377 @@ NO incluyas explicaciones, SOLO el JSON."""
             texto_pliego: Texto completo del pliego técnico (opcional)
             
         Returns:
-            Diccionario con análisis completo
+            Diccionario con las claves titulo_adaptado, stack_tecnologico,
+            conceptos_tic y resumen_tecnico, o None si falla
         """
-        logger.info(f"Iniciando análisis completo de licitación: {titulo[:50]}...")
+        texto_analizar = self._construir_texto_analizar(titulo, descripcion, texto_pliego)
+        model = self._modelo_analisis_completo(texto_pliego)
+        cache_key = self._get_cache_key(texto_analizar, "completo", model)
+        
+        response = self._call_openai(
+            self.PROMPT_ANALISIS_COMPLETO, texto_analizar, cache_key, json_mode=True, model=model
+        )
+        
+        if not response:
+            return None
+        
+        return self._parsear_analisis_completo(response)
+    
+    def _modelo_analisis_completo(self, texto_pliego: Optional[str]) -> str:
+        """Modelo del análisis combinado: el grande solo si hay pliego que resumir"""
+        return self.model_large if texto_pliego else self.model_small
+    
+    def _construir_texto_analizar(self, titulo: str, descripcion: str, texto_pliego: Optional[str] = None) -> str:
+        """Mensaje de usuario con título, descripción y el pliego recortado a MAX_PLIEGO_CHARS"""
+        texto_analizar = f"Título: {titulo}\n\nDescripción: {descripcion}"
+        
+        if texto_pliego:
+            # Limitar el texto del pliego para no exceder límites de tokens
+            texto_pliego_limitado = texto_pliego[:self.MAX_PLIEGO_CHARS]
+            texto_analizar += f"\n\nPliego técnico:\n{texto_pliego_limitado}"
+        
+        return texto_analizar
+    
+    def _parsear_analisis_completo(self, response: str) -> Optional[Dict]:
+        """Valida la respuesta JSON del análisis combinado y limpia el título adaptado"""
+        try:
+            result = orjson.loads(response)
+        except orjson.JSONDecodeError as e:
+            logger.error(f"Error parseando respuesta JSON: {e}\nRespuesta: {response}")
+            return None
+        
+        if not isinstance(result, dict):
+            logger.error(f"Respuesta JSON inesperada: {response}")
+            return None
+        
+        titulo_adaptado = result.get('titulo_adaptado')
+        stack = result.get('stack_tecnologico')
+        conceptos = result.get('conceptos_tic')
+        resumen = result.get('resumen_tecnico')
+        
+        return {
+            'titulo_adaptado': self._limpiar_titulo_adaptado(titulo_adaptado) if isinstance(titulo_adaptado, str) else None,
+            'stack_tecnologico': stack if isinstance(stack, dict) else None,
+            'conceptos_tic': conceptos if isinstance(conceptos, list) else None,
+            'resumen_tecnico': resumen if isinstance(resumen, dict) else None
+        }
+    
+    def enviar_batch(self, licitaciones: List[Dict]) -> Dict:
+        """
+        Envía un lote de licitaciones a la Batch API de OpenAI sin esperar al resultado
+        
+        Pensado para tareas en segundo plano: cuesta la mitad que las llamadas en
+        tiempo real a cambio de una latencia de hasta 24h. Sube un JSONL con una
+        petición combinada por licitación, crea el batch y lo registra en Redis para
+        que recoger_batch lo procese después. Las licitaciones ya cacheadas no se
+        envían: su análisis se devuelve directamente.
+        
+        Args:
+            licitaciones: Diccionarios con id, titulo, descripcion y texto_pliego (opcional)
+            
+        Returns:
+            Diccionario con batch_id (None si no se envió nada) y resultados
+            {id: análisis completo} de las licitaciones cacheadas
+        """
+        resultados = {}
+        pendientes = {}  # custom_id -> datos para cruzar la salida del batch
+        lineas = []
+        
+        for lic in licitaciones:
+            texto_pliego = lic.get('texto_pliego')
+            texto_analizar = self._construir_texto_analizar(lic['titulo'], lic['descripcion'], texto_pliego)
+            model = self._modelo_analisis_completo(texto_pliego)
+            cache_key = self._get_cache_key(texto_analizar, "completo", model)
+            
+            cached = self._get_cached(cache_key)
+            if cached is not None:
+                resultados[lic['id']] = self._resultado_desde_respuesta(cached, texto_pliego is not None)
+                continue
+            
+            custom_id = f"licitacion-{lic['id']}"
+            pendientes[custom_id] = {
+                'id': lic['id'],
+                'cache_key': cache_key,
+                'con_pliego': texto_pliego is not None
+            }
+            lineas.append(orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._construir_payload(
+                    self.PROMPT_ANALISIS_COMPLETO, texto_analizar, json_mode=True, model=model
+                )
+            }))
+        
+        if not lineas:
+            return {'batch_id': None, 'resultados': resultados}
+        
+        batch_id = self._crear_batch(b"\n".join(lineas))
+        if batch_id and not self._registrar_batch(batch_id, pendientes):
+            # Sin registro nadie recogería la salida: cancelar para no pagarla
+            self._cancelar_batch(batch_id)
+            batch_id = None
+        
+        return {'batch_id': batch_id, 'resultados': resultados}
+    
+    def batches_en_curso(self) -> Dict[str, Dict]:
+        """Batches enviados y aún no recogidos: {batch_id: registro}"""
+        redis_client = get_redis()
+        if redis_client is None:
+            return {}
+        try:
+            registros = redis_client.hgetall(self.BATCHES_KEY)
+        except Exception as e:
+            logger.warning(f"Error leyendo batches de IA en Redis: {e}")
+            return {}
+        return {batch_id: orjson.loads(registro) for batch_id, registro in registros.items()}
+    
+    def ids_en_batch(self) -> Set[int]:
+        """Ids de licitaciones con un batch en curso (no deben enviarse de nuevo)"""
+        return {
+            peticion['id']
+            for registro in self.batches_en_curso().values()
+            for peticion in registro['peticiones'].values()
+        }
+    
+    def recoger_batch(self, batch_id: str, registro: Dict) -> Optional[Dict]:
+        """
+        Consulta un batch registrado y, si ha terminado, descarga y cachea su salida
+        
+        Un batch que supera OPENAI_BATCH_MAX_WAIT_HOURS se cancela; su salida parcial
+        se recoge en la siguiente consulta, cuando OpenAI lo da por cancelado.
         
-        # Generar título adaptado
-        titulo_adaptado = self.generar_titulo_adaptado(titulo)
+        Args:
+            batch_id: Id del batch en OpenAI
+            registro: Registro guardado por enviar_batch (ver batches_en_curso)
+            
+        Returns:
+            None si el batch sigue en curso; si ha terminado, {id: análisis completo o None}
+        """
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        
+        try:
+            response = get_openai_session().get(f"{self.api_base}/batches/{batch_id}", headers=headers, timeout=60)
+            response.raise_for_status()
+            batch = orjson.loads(response.content)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Error consultando el batch de OpenAI {batch_id}: {e}")
+            return None
+        
+        if batch['status'] not in ('completed', 'failed', 'expired', 'cancelled'):
+            if time.time() - registro['creado'] > self.batch_max_wait and batch['status'] != 'cancelling':
+                logger.error(f"Batch de OpenAI {batch_id} sin terminar tras la espera máxima, cancelando")
+                self._cancelar_batch(batch_id)
+            return None
+        
+        # Un batch expirado o cancelado puede traer salida parcial de las peticiones completadas
+        respuestas = {}
+        if batch.get('output_file_id'):
+            respuestas = self._descargar_salida_batch(batch['output_file_id'])
+        else:
+            logger.error(f"Batch de OpenAI {batch_id} terminado sin salida (estado: {batch['status']})")
+        
+        resultados = {}
+        for custom_id, peticion in registro['peticiones'].items():
+            response = respuestas.get(custom_id)
+            if response is None:
+                resultados[peticion['id']] = None
+                continue
+            # En caché: si el resultado no llega a guardarse, el siguiente envío no paga de nuevo
+            self._set_cached(peticion['cache_key'], response)
+            resultados[peticion['id']] = self._resultado_desde_respuesta(response, peticion['con_pliego'])
+        
+        logger.info(f"Batch de OpenAI {batch_id} recogido: {len(respuestas)} respuestas")
+        
+        return resultados
+    
+    def olvidar_batch(self, batch_id: str) -> None:
+        """Elimina el registro de un batch ya recogido y guardado"""
+        redis_client = get_redis()
+        if redis_client is None:
+            return
+        try:
+            redis_client.hdel(self.BATCHES_KEY, batch_id)
+        except Exception as e:
+            logger.warning(f"Error eliminando el batch de IA {batch_id} de Redis: {e}")
+    
+    def _registrar_batch(self, batch_id: str, peticiones: Dict) -> bool:
+        """Guarda en Redis el batch y sus peticiones para recogerlo más tarde"""
+        redis_client = get_redis()
+        if redis_client is None:
+            return False
+        try:
+            redis_client.hset(
+                self.BATCHES_KEY,
+                batch_id,
+                orjson.dumps({'creado': time.time(), 'peticiones': peticiones})
+            )
+        except Exception as e:
+            logger.error(f"Error registrando el batch de IA {batch_id} en Redis: {e}")
+            return False
+        return True
+    
+    def _crear_batch(self, jsonl: bytes) -> Optional[str]:
+        """
+        Sube el JSONL y crea el batch
+        
+        Returns:
+            Id del batch o None si falla
+        """
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        session = get_openai_session()
+        
+        try:
+            response = session.post(
+                f"{self.api_base}/files",
+                headers=headers,
+                data={"purpose": "batch"},
+                files={"file": ("analisis.jsonl", jsonl)},
+                timeout=300
+            )
+            response.raise_for_status()
+            
+            response = session.post(
+                f"{self.api_base}/batches",
+                headers={**headers, "Content-Type": "application/json"},
+                data=orjson.dumps({
+                    "input_file_id": orjson.loads(response.content)['id'],
+                    "endpoint": "/v1/chat/completions",
+                    "completion_window": "24h"
+                }),
+                timeout=60
+            )
+            response.raise_for_status()
+            batch_id = orjson.loads(response.content)['id']
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            logger.error(f"Error creando el batch de OpenAI: {e}")
+            return None
+        
+        logger.info(f"Batch de OpenAI {batch_id} creado")
+        
+        return batch_id
+    
+    def _cancelar_batch(self, batch_id: str) -> None:
+        """Cancela un batch para no pagar peticiones cuya salida no se usará"""
+        try:
+            get_openai_session().post(
+                f"{self.api_base}/batches/{batch_id}/cancel",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=60
+            )
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error cancelando el batch de OpenAI {batch_id}: {e}")
+    
+    def _descargar_salida_batch(self, output_file_id: str) -> Dict[str, str]:
+        """
+        Descarga la salida JSONL de un batch
         
-        # Identificar stack tecnológico
-        stack = self.identificar_stack_tecnologico(titulo, descripcion, texto_pliego)
+        Returns:
+            Diccionario {custom_id: contenido de la respuesta}; vacío si falla
+        """
+        try:
+            response = get_openai_session().get(
+                f"{self.api_base}/files/{output_file_id}/content",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=300
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error descargando la salida del batch de OpenAI: {e}")
+            return {}
+        
+        respuestas = {}
+        for linea in response.content.splitlines():
+            if not linea:
+                continue
+            try:
+                fila = orjson.loads(linea)
+                resultado = fila.get('response') or {}
+                if resultado.get('status_code') != 200:
+                    logger.warning(f"Petición {fila.get('custom_id')} fallida en el batch: {fila.get('error') or resultado.get('status_code')}")
+                    continue
+                respuestas[fila['custom_id']] = resultado['body']['choices'][0]['message']['content']
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                logger.warning(f"Línea de salida del batch no válida: {e}")
+        
+        return respuestas
+    
+    def _resultado_desde_respuesta(self, response: str, con_pliego: bool) -> Optional[Dict]:
+        """Análisis completo a partir de la respuesta JSON de la llamada combinada"""
+        combinado = self._parsear_analisis_completo(response)
+        if not combinado:
+            return None
+        return self._componer_resultado(
+            combinado['titulo_adaptado'],
+            combinado['stack_tecnologico'],
+            combinado['conceptos_tic'],
+            combinado['resumen_tecnico'],
+            con_pliego
+        )
+    
+    def analizar_licitacion_completa(
+        self,
+        titulo: str,
+        descripcion: str,
+        texto_pliego: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Realiza un análisis completo de una licitación
         
-        # Clasificar conceptos
-        conceptos = self.clasificar_conceptos_tic(titulo, descripcion, texto_pliego)
+        Usa una única llamada combinada (analizar_todo_en_una_llamada); los campos
+        que falten (o todos, si la llamada falla) se piden por separado.
         
-        # Generar resumen técnico
-        resumen = self.generar_resumen_tecnico(titulo, descripcion, texto_pliego)
+        Args:
+            titulo: Título de la licitación
+            descripcion: Descripción breve
+            texto_pliego: Texto completo del pliego técnico (opcional)
+            
+        Returns:
+            Diccionario con análisis completo
+        """
+        logger.info(f"Iniciando análisis completo de licitación: {titulo[:50]}...")
         
+        combinado = self.analizar_todo_en_una_llamada(titulo, descripcion, texto_pliego)
+        if combinado is None:
+            logger.warning("Análisis combinado fallido, lanzando los análisis por separado")
+            combinado = dict.fromkeys(('titulo_adaptado', 'stack_tecnologico', 'conceptos_tic', 'resumen_tecnico'))
+        
+        # Solo se repiten por separado los campos que faltan en la respuesta combinada
+        tareas = {
+            'titulo_adaptado': (self.generar_titulo_adaptado, (titulo,)),
+            'stack_tecnologico': (self.identificar_stack_tecnologico, (titulo, descripcion, texto_pliego)),
+            'conceptos_tic': (self.clasificar_conceptos_tic, (titulo, descripcion, texto_pliego)),
+            'resumen_tecnico': (self.generar_resumen_tecnico, (titulo, descripcion, texto_pliego)),
+        }
+        faltan = [campo for campo in tareas if combinado[campo] is None]
+        
+        if faltan:
+            logger.info(f"Análisis por separado de: {', '.join(faltan)}")
+            # Los análisis son independientes: se lanzan en paralelo y la latencia
+            # total es la de la llamada más lenta. El límite de RPM y los reintentos ante
+            # 429 ya los aplica _post_con_reintentos en cada hilo.
+            with ThreadPoolExecutor(max_workers=len(faltan)) as executor:
+                futures = {campo: executor.submit(tareas[campo][0], *tareas[campo][1]) for campo in faltan}
+                for campo, future in futures.items():
+                    combinado[campo] = future.result()
+        
+        return self._componer_resultado(
+            combinado['titulo_adaptado'],
+            combinado['stack_tecnologico'],
+            combinado['conceptos_tic'],
+            combinado['resumen_tecnico'],
+            texto_pliego is not None
+        )
+    
+    def _componer_resultado(
+        self,
+        titulo_adaptado: Optional[str],
+        stack: Optional[Dict],
+        conceptos: Optional[List[str]],
+        resumen: Optional[Dict],
+        con_pliego: bool
+    ) -> Optional[Dict]:
+        """Construye el diccionario de análisis completo (None si no hay ningún resultado)"""
         if not stack and not conceptos and not resumen and not titulo_adaptado:
             logger.error("No se pudo completar ningún análisis")
             return None
@@ -328,7 +921,7 @@ NO incluyas explicaciones, SOLO el JSON."""
             'stack_tecnologico': stack or {},
             'conceptos_tic': conceptos or [],
             'resumen_tecnico': resumen or {},
-            'analizado_con_pliego': texto_pliego is not None
+            'analizado_con_pliego': con_pliego
         }
         
         logger.info(f"Análisis completo finalizado")
@@ -345,52 +938,35 @@ NO incluyas explicaciones, SOLO el JSON."""
         Returns:
             Título adaptado o None si falla
         """
-        system_prompt = """Eres un experto en redacción que adapta títulos de licitaciones públicas.
-
-Tu tarea es convertir títulos largos y burocráticos en títulos más naturales, concisos y fáciles de leer.
-
-Reglas:
-1. Máximo 80 caracteres
-2. Eliminar redundancias y jerga burocrática
-3. Mantener la información esencial: qué se contrata y para qué
-4. Usar lenguaje natural y directo
-5. NO incluir códigos, expedientes ni referencias administrativas
-6. Responder SOLO con el título adaptado, sin comillas ni explicaciones
-
-Ejemplos:
-
-Original: "Servicio de mantenimiento correctivo y evolutivo del sistema de información de gestión económica y presupuestaria del Ayuntamiento de Madrid para el ejercicio 2025"
-Adaptado: "Mantenimiento del sistema de gestión económica del Ayuntamiento de Madrid"
-
-Original: "Contrato de servicios para el desarrollo, implantación y mantenimiento de una plataforma digital de tramitación telemática basada en tecnologías cloud"
-Adaptado: "Desarrollo de plataforma digital de tramitación en la nube"
-
-Original: "Suministro e instalación de equipamiento informático y licencias de software para la modernización de la infraestructura TI"
-Adaptado: "Equipamiento informático y licencias para modernización TI"""
-        
         user_prompt = f"Título original: {titulo_original}"
         
-        cache_key = self._get_cache_key(titulo_original, "titulo_adaptado")
+        cache_key = self._get_cache_key(titulo_original, "titulo_adaptado", self.model_small)
         
-        response = self._call_openai(system_prompt, user_prompt, cache_key)
+        response = self._call_openai(self.PROMPT_TITULO_ADAPTADO, user_prompt, cache_key, model=self.model_small)
         
         if not response:
             return None
         
-        # Limpiar la respuesta (eliminar comillas si las hay)
-        titulo_adaptado = response.strip().strip('"').strip("'")
+        titulo_adaptado = self._limpiar_titulo_adaptado(response)
+        
+        logger.info(f"Título adaptado generado: {titulo_adaptado}")
+        
+        return titulo_adaptado
+    
+    def _limpiar_titulo_adaptado(self, titulo_adaptado: str) -> Optional[str]:
+        """Elimina comillas del título adaptado y lo trunca si es demasiado largo"""
+        titulo_adaptado = titulo_adaptado.strip().strip('"').strip("'")
         
         # Validar longitud
         if len(titulo_adaptado) > 100:
             logger.warning(f"Título adaptado muy largo ({len(titulo_adaptado)} caracteres), truncando...")
             titulo_adaptado = titulo_adaptado[:97] + "..."
         
-        logger.info(f"Título adaptado generado: {titulo_adaptado}")
-        
-        return titulo_adaptado
+        return titulo_adaptado or None
     
     def clear_cache(self):
-        """Limpia la caché de respuestas"""
-        self._cache.clear()
+        """Limpia la caché de respuestas en memoria (las entradas de Redis expiran por TTL)"""
+        with self._cache_lock:
+            self._cache.clear()
         logger.info("Caché de IA limpiada")
 
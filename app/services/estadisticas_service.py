@@ -0,0 +1,199 @@
+"""
+Servicio de estadísticas agregadas de licitaciones
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, text
+from app.models.licitacion import Licitacion, EstadisticasSnapshot
+from typing import Dict, Any, Optional
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EstadisticasService:
+    """Servicio para calcular y materializar estadísticas de licitaciones"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def calcular(
+        self,
+        fecha_desde: Optional[datetime] = None,
+        fecha_hasta: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Calcula las estadísticas directamente sobre la tabla de licitaciones
+        
+        Args:
+            fecha_desde: Fecha desde (filtra por fecha_actualizacion)
+            fecha_hasta: Fecha hasta (filtra por fecha_actualizacion)
+            
+        Returns:
+            Diccionario con los campos de EstadisticasResponse
+        """
+        # Filtros de fecha
+        condiciones_fecha = []
+        params_fecha = {}
+        if fecha_desde:
+            condiciones_fecha.append("fecha_actualizacion >= :fecha_desde")
+            params_fecha["fecha_desde"] = fecha_desde
+        if fecha_hasta:
+            condiciones_fecha.append("fecha_actualizacion <= :fecha_hasta")
+            params_fecha["fecha_hasta"] = fecha_hasta
+        where_fecha = f"WHERE {' AND '.join(condiciones_fecha)}" if condiciones_fecha else ""
+        
+        # Todas las agregaciones en una sola query: el CTE se referencia varias veces,
+        # así que PostgreSQL lo materializa y la tabla se recorre una única vez.
+        # Los valores JSON que no sean array/objeto se ignoran.
+        filas = self.db.execute(text(f"""
+            WITH filtradas AS (
+                SELECT estado, tipo_contrato, presupuesto_base, conceptos_tic, stack_tecnologico
+                FROM licitaciones
+                {where_fecha}
+            )
+            SELECT 'total' AS grupo, NULL::text AS clave, COUNT(*)::numeric AS valor FROM filtradas
+            UNION ALL
+            SELECT 'presupuesto_total', NULL, SUM(presupuesto_base) FROM filtradas
+            UNION ALL
+            SELECT 'presupuesto_promedio', NULL, AVG(presupuesto_base) FROM filtradas
+            UNION ALL
+            SELECT 'estado', estado, COUNT(*) FROM filtradas
+            WHERE estado IS NOT NULL GROUP BY estado
+            UNION ALL
+            SELECT 'tipo', tipo_contrato, COUNT(*) FROM filtradas
+            WHERE tipo_contrato IS NOT NULL GROUP BY tipo_contrato
+            UNION ALL
+            SELECT 'concepto', concepto, COUNT(*)
+            FROM filtradas,
+                 jsonb_array_elements_text(
+                     CASE WHEN jsonb_typeof(conceptos_tic::jsonb) = 'array'
+                          THEN conceptos_tic::jsonb ELSE '[]'::jsonb END
+                 ) AS concepto
+            GROUP BY concepto
+            UNION ALL
+            (
+                SELECT 'tecnologia', tech, COUNT(*)
+                FROM filtradas,
+                     jsonb_each(
+                         CASE WHEN jsonb_typeof(stack_tecnologico::jsonb) = 'object'
+                              THEN stack_tecnologico::jsonb ELSE '{{}}'::jsonb END
+                     ) AS categoria,
+                     jsonb_array_elements_text(
+                         CASE WHEN jsonb_typeof(categoria.value) = 'array'
+                              THEN categoria.value ELSE '[]'::jsonb END
+                     ) AS tech
+                GROUP BY tech
+                ORDER BY 3 DESC
+                LIMIT 10
+            )
+        """), params_fecha).all()
+        
+        total_licitaciones = 0
+        total_presupuesto = 0.0
+        presupuesto_promedio = 0.0
+        licitaciones_por_estado = {}
+        licitaciones_por_tipo = {}
+        licitaciones_por_concepto = {}
+        tecnologias = []
+        
+        for grupo, clave, valor in filas:
+            if grupo == 'total':
+                total_licitaciones = int(valor or 0)
+            elif grupo == 'presupuesto_total':
+                total_presupuesto = float(valor or 0)
+            elif grupo == 'presupuesto_promedio':
+                presupuesto_promedio = float(valor or 0)
+            elif grupo == 'estado':
+                licitaciones_por_estado[clave] = int(valor)
+            elif grupo == 'tipo':
+                licitaciones_por_tipo[clave] = int(valor)
+            elif grupo == 'concepto':
+                licitaciones_por_concepto[clave] = int(valor)
+            elif grupo == 'tecnologia':
+                tecnologias.append((clave, int(valor)))
+        
+        # Top 10 tecnologías (UNION ALL no garantiza el orden)
+        top_tecnologias = [
+            {"nombre": tech, "count": count}
+            for tech, count in sorted(tecnologias, key=lambda x: x[1], reverse=True)
+        ]
+        
+        # Evolución mensual (últimos 12 meses, incluido el actual) en una sola query
+        mes_actual = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        meses = []
+        for i in range(11, -1, -1):
+            anio, mes = divmod(mes_actual.year * 12 + mes_actual.month - 1 - i, 12)
+            meses.append(mes_actual.replace(year=anio, month=mes + 1))
+        
+        mes_trunc = func.date_trunc('month', Licitacion.fecha_actualizacion).label('mes')
+        conteos_mes = self.db.query(
+            mes_trunc,
+            func.count(Licitacion.id)
+        ).filter(
+            Licitacion.fecha_actualizacion >= meses[0]
+        ).group_by(mes_trunc).all()
+        
+        conteos_por_mes = {mes.strftime("%Y-%m"): count for mes, count in conteos_mes}
+        
+        # Rellenar con 0 los meses sin licitaciones
+        evolucion_mensual = [
+            {"mes": mes.strftime("%Y-%m"), "count": conteos_por_mes.get(mes.strftime("%Y-%m"), 0)}
+            for mes in meses
+        ]
+        
+        return {
+            'total_licitaciones': total_licitaciones,
+            'total_presupuesto': total_presupuesto,
+            'presupuesto_promedio': presupuesto_promedio,
+            'licitaciones_por_estado': licitaciones_por_estado,
+            'licitaciones_por_tipo': licitaciones_por_tipo,
+            'licitaciones_por_concepto': licitaciones_por_concepto,
+            'top_tecnologias': top_tecnologias,
+            'evolucion_mensual': evolucion_mensual,
+        }
+    
+    def refrescar_snapshot(self) -> EstadisticasSnapshot:
+        """
+        Recalcula las estadísticas globales y las guarda en stats_snapshot
+        
+        Returns:
+            Snapshot actualizado (no hace commit)
+        """
+        estadisticas = self.calcular()
+        
+        snapshot = self.db.query(EstadisticasSnapshot).first()
+        if snapshot is None:
+            snapshot = EstadisticasSnapshot()
+            self.db.add(snapshot)
+        
+        for campo, valor in estadisticas.items():
+            setattr(snapshot, campo, valor)
+        snapshot.fecha_calculo = datetime.now()
+        
+        self.db.flush()
+        logger.info(f"Snapshot de estadísticas refrescado: {estadisticas['total_licitaciones']} licitaciones")
+        
+        return snapshot
+    
+    def obtener_snapshot(self) -> Dict[str, Any]:
+        """
+        Devuelve las estadísticas globales materializadas
+        
+        Si todavía no existe snapshot (p.ej. recién desplegado), las calcula en vivo.
+        """
+        snapshot = self.db.query(EstadisticasSnapshot).first()
+        if snapshot is None:
+            logger.warning("No hay snapshot de estadísticas, calculando en vivo")
+            return self.calcular()
+        
+        return {
+            'total_licitaciones': snapshot.total_licitaciones,
+            'total_presupuesto': float(snapshot.total_presupuesto or 0),
+            'presupuesto_promedio': float(snapshot.presupuesto_promedio or 0),
+            'licitaciones_por_estado': snapshot.licitaciones_por_estado or {},
+            'licitaciones_por_tipo': snapshot.licitaciones_por_tipo or {},
+            'licitaciones_por_concepto': snapshot.licitaciones_por_concepto or {},
+            'top_tecnologias': snapshot.top_tecnologias or [],
+            'evolucion_mensual': snapshot.evolucion_mensual or [],
+        }
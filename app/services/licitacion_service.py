@@ -1,14 +1,34 @@
 """
 Servicio para gestionar licitaciones
 """
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from app.models.licitacion import Licitacion
+from app.core.cache import invalidar_licitacion_detalle
 from typing import List, Optional, Dict
 from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Ids de licitaciones modificadas en la transacción actual, pendientes de invalidar en caché
+_PENDIENTES_INVALIDAR = "licitaciones_pendientes_invalidar"
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_pendientes_tras_commit(session: Session) -> None:
+    """Invalida el detalle cacheado una vez confirmados los cambios"""
+    pendientes = session.info.pop(_PENDIENTES_INVALIDAR, None)
+    if pendientes:
+        invalidar_licitacion_detalle(*pendientes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_pendientes_tras_rollback(session: Session, previous_transaction) -> None:
+    """Sin commit la fila cacheada sigue siendo la vigente: nada que invalidar"""
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDIENTES_INVALIDAR, None)
+
 
 class LicitacionService:
     """Servicio para operaciones CRUD de licitaciones"""
@@ -16,6 +36,15 @@ class LicitacionService:
     def __init__(self, db: Session):
         self.db = db
     
+    def _invalidar_tras_commit(self, licitacion_id: int) -> None:
+        """
+        Marca el detalle cacheado de la licitación para invalidarlo tras el commit
+        
+        Invalidar justo tras el flush dejaría una ventana hasta el commit del llamador
+        (minutos en el scraping) en la que un GET volvería a cachear la fila antigua.
+        """
+        self.db.info.setdefault(_PENDIENTES_INVALIDAR, set()).add(licitacion_id)
+    
     def create(self, licitacion_data: Dict) -> Licitacion:
         """
         Crea una nueva licitación
@@ -26,6 +55,10 @@ class LicitacionService:
         Returns:
             Licitación creada
         """
+        # Sin fecha de actualización (feed sin <updated>) se usa el default de la BD
+        if licitacion_data.get('fecha_actualizacion') is None:
+            licitacion_data.pop('fecha_actualizacion', None)
+        
         # Convertir fechas de string a datetime si es necesario
         if 'fecha_actualizacion' in licitacion_data and isinstance(licitacion_data['fecha_actualizacion'], str):
             try:
@@ -52,10 +85,7 @@ class LicitacionService:
             except Exception:
                 pass
         
-        # Convertir lista de CPV a string JSON si es necesario
-        if 'codigos_cpv' in licitacion_data and isinstance(licitacion_data['codigos_cpv'], list):
-            import json
-            licitacion_data['codigos_cpv'] = json.dumps(licitacion_data['codigos_cpv'])
+        # codigos_cpv es JSONB: la lista se guarda tal cual, sin serializar a string
         
         # Extraer documentos antes de crear la licitación
         documentos_data = licitacion_data.pop('documentos', [])
@@ -82,13 +112,20 @@ class LicitacionService:
         return licitacion
     
     def get_by_id(self, licitacion_id: int) -> Optional[Licitacion]:
-        """Obtiene una licitación por su ID"""
-        return self.db.query(Licitacion).filter(Licitacion.id == licitacion_id).first()
+        """Obtiene una licitación por su ID (sin query si ya está en la sesión)"""
+        return self.db.get(Licitacion, licitacion_id)
     
     def get_by_id_licitacion(self, id_licitacion: str) -> Optional[Licitacion]:
         """Obtiene una licitación por su ID de licitación (del feed)"""
         return self.db.query(Licitacion).filter(Licitacion.id_licitacion == id_licitacion).first()
     
+    def get_by_ids_licitacion(self, ids_licitacion: List[str]) -> Dict[str, Licitacion]:
+        """Obtiene en una sola query las licitaciones existentes de un lote, indexadas por id_licitacion"""
+        if not ids_licitacion:
+            return {}
+        existentes = self.db.query(Licitacion).filter(Licitacion.id_licitacion.in_(ids_licitacion)).all()
+        return {lic.id_licitacion: lic for lic in existentes}
+    
     def get_by_expediente(self, expediente: str) -> Optional[Licitacion]:
         """Obtiene una licitación por su número de expediente"""
         return self.db.query(Licitacion).filter(Licitacion.expediente == expediente).first()
@@ -153,6 +190,9 @@ class LicitacionService:
         has_changes = False
         
         for key, value in licitacion_data.items():
+            # fecha_actualizacion es NOT NULL: no se borra si el feed no la trae
+            if key == 'fecha_actualizacion' and value is None:
+                continue
             if hasattr(licitacion, key):
                 current_value = getattr(licitacion, key)
                 if current_value != value:
@@ -162,6 +202,7 @@ class LicitacionService:
         if has_changes:
             licitacion.updated_at = datetime.now()
             self.db.flush()
+            self._invalidar_tras_commit(licitacion.id)
             logger.info(f"Licitación actualizada: {licitacion.expediente}")
         
         return has_changes
@@ -174,6 +215,7 @@ class LicitacionService:
         
         self.db.delete(licitacion)
         self.db.flush()
+        self._invalidar_tras_commit(licitacion_id)
         
         logger.info(f"Licitación eliminada: {licitacion.expediente}")
         
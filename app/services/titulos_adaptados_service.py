@@ -0,0 +1,144 @@
+"""
+Servicio para generar en bloque los títulos adaptados con IA
+"""
+from sqlalchemy import func, literal_column, or_, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from app.core.cache import invalidar_licitacion_detalle
+from app.models.licitacion import Licitacion
+from app.services.ai_service import AIService
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TitulosAdaptadosService:
+    """Genera títulos adaptados para las licitaciones que no los tienen"""
+
+    BATCH_SIZE = 100  # Licitaciones por commit
+    MAX_WORKERS = 10  # Llamadas concurrentes a OpenAI
+
+    def __init__(self, db: Session, ai_service: Optional[AIService] = None, batch_size: Optional[int] = None):
+        self.db = db
+        self.ai_service = ai_service or AIService()
+        if batch_size:
+            self.BATCH_SIZE = batch_size
+
+    def _condicion_pendiente(self):
+        """Filtro de licitaciones sin titulo_adaptado"""
+        # '' literal (no parámetro) para que el planner use el índice parcial ix_licit_sin_titulo
+        return or_(Licitacion.titulo_adaptado == None, Licitacion.titulo_adaptado == literal_column("''"))
+
+    def _siguiente_lote(self, ultimo_id: int) -> List[Row]:
+        """
+        Siguiente lote de pendientes (solo id y título) paginando por id
+
+        Se pagina por clave en lugar de usar yield_per porque el commit de cada
+        lote cerraría el cursor de servidor a mitad de la iteración.
+        """
+        return self.db.execute(
+            select(Licitacion.id, Licitacion.titulo)
+            .where(self._condicion_pendiente(), Licitacion.id > ultimo_id)
+            .order_by(Licitacion.id)
+            .limit(self.BATCH_SIZE)
+        ).all()
+
+    def generar_pendientes(
+        self,
+        progreso: Optional[Callable[[int, int], None]] = None,
+        desde_id: int = 0,
+        max_lotes: Optional[int] = None
+    ) -> Dict:
+        """
+        Genera los títulos adaptados pendientes
+
+        Las llamadas a OpenAI se lanzan en paralelo (MAX_WORKERS) y los resultados
+        se guardan con un UPDATE masivo y un commit por cada lote de BATCH_SIZE.
+        Nunca se cargan en memoria más de BATCH_SIZE filas a la vez.
+
+        Args:
+            progreso: Callback opcional (procesadas, total) tras cada lote
+            desde_id: Procesar solo licitaciones con id mayor que este
+            max_lotes: Máximo de lotes a procesar (None: todos los pendientes)
+
+        Returns:
+            Diccionario con total, exitosas, fallidas, errores, ultimo_id (para
+            continuar con desde_id) y completado (False si quedan lotes por procesar)
+        """
+        total = self.db.query(func.count(Licitacion.id)).filter(self._condicion_pendiente()).scalar() or 0
+
+        exitosas = 0
+        fallidas = 0
+        errores = []
+
+        if total == 0:
+            return {'total': 0, 'exitosas': 0, 'fallidas': 0, 'errores': [], 'ultimo_id': desde_id, 'completado': True}
+
+        procesadas = 0
+        ultimo_id = desde_id
+        lotes = 0
+        completado = False
+
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            while True:
+                if max_lotes is not None and lotes >= max_lotes:
+                    break
+
+                lote = self._siguiente_lote(ultimo_id)
+                if not lote:
+                    completado = True
+                    break
+                ultimo_id = lote[-1].id
+                lotes += 1
+
+                # La sesión no es thread-safe: solo las llamadas a la IA van en paralelo
+                futures = [
+                    executor.submit(self.ai_service.generar_titulo_adaptado, fila.titulo)
+                    for fila in lote
+                ]
+
+                pendientes = []
+                for fila, future in zip(lote, futures):
+                    try:
+                        titulo_adaptado = future.result()
+                    except Exception as e:
+                        titulo_adaptado = None
+                        errores.append({"licitacion_id": fila.id, "error": str(e)})
+
+                    if titulo_adaptado:
+                        pendientes.append({"id": fila.id, "titulo_adaptado": titulo_adaptado})
+                        exitosas += 1
+                    else:
+                        fallidas += 1
+
+                try:
+                    # UPDATE ... WHERE id = ? ejecutado como executemany en un solo viaje
+                    if pendientes:
+                        self.db.bulk_update_mappings(Licitacion, pendientes)
+                    self.db.commit()
+                    invalidar_licitacion_detalle(*(p["id"] for p in pendientes))
+                except Exception as e:
+                    logger.error(f"Error guardando lote de títulos adaptados: {e}")
+                    self.db.rollback()
+                    raise
+
+                procesadas += len(lote)
+                if progreso:
+                    progreso(procesadas, total)
+
+                if len(lote) < self.BATCH_SIZE:
+                    completado = True
+                    break
+
+        logger.info(f"Títulos adaptados generados: {exitosas} exitosos, {fallidas} fallidos de {procesadas}")
+
+        return {
+            'total': procesadas,
+            'exitosas': exitosas,
+            'fallidas': fallidas,
+            'errores': errores,
+            'ultimo_id': ultimo_id,
+            'completado': completado
+        }
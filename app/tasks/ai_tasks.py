@@ -2,13 +2,16 @@
 Tareas de Celery para análisis con IA
 """
 from celery import Task
+from sqlalchemy.orm import selectinload
 from app.core.celery_app import celery_app
-from app.core.database import SessionLocal
+from app.core.database import get_session_local
+from app.core.cache import invalidar_licitacion_detalle
 from app.models.licitacion import Licitacion
 from app.services.ai_service import AIService
+from app.services.titulos_adaptados_service import TitulosAdaptadosService
 from datetime import datetime
+from typing import Dict, Optional
 import logging
-import json
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +25,23 @@ class DatabaseTask(Task):
             self._db.close()
 
 
+def _texto_pliego(lic: Licitacion) -> Optional[str]:
+    """Texto del primer documento procesado (pliego técnico) de la licitación, si existe"""
+    for doc in lic.documentos:
+        if doc.procesado and doc.texto_extraido:
+            return doc.texto_extraido
+    return None
+
+
+def _guardar_analisis(lic: Licitacion, resultado: Dict) -> None:
+    """Guarda en la licitación los resultados del análisis completo"""
+    lic.stack_tecnologico = resultado['stack_tecnologico']
+    lic.conceptos_tic = resultado['conceptos_tic']
+    lic.resumen_tecnico = resultado['resumen_tecnico']
+    lic.analizado_ia = True
+    lic.fecha_analisis_ia = datetime.now()
+
+
 @celery_app.task(base=DatabaseTask, bind=True, name="app.tasks.ai_tasks.analyze_pending_licitaciones")
 def analyze_pending_licitaciones(self, limit: int = 20):
     """
@@ -36,15 +56,27 @@ def analyze_pending_licitaciones(self, limit: int = 20):
     logger.info(f"Iniciando análisis con IA de licitaciones pendientes (límite: {limit})")
     logger.info(f"FASE 1: Solo analizando licitaciones con presupuesto >€{settings.MIN_BUDGET_FOR_AI_ANALYSIS:,}")
     
-    db = SessionLocal()
+    db = get_session_local()()
     self._db = db
     
     try:
+        ai_service = AIService()
+        
         # Obtener licitaciones sin analizar Y con presupuesto suficiente (Fase 1 optimización)
-        licitaciones = db.query(Licitacion).filter(
+        # Documentos cargados en una sola query IN (...) en lugar de una por licitación
+        query = db.query(Licitacion).options(
+            selectinload(Licitacion.documentos)
+        ).filter(
             Licitacion.analizado_ia == False,
             Licitacion.presupuesto_base >= settings.MIN_BUDGET_FOR_AI_ANALYSIS  # Solo >€50k
-        ).limit(limit).all()
+        )
+        
+        # Las que ya esperan en un batch no se vuelven a enviar (se pagarían dos veces)
+        en_batch = ai_service.ids_en_batch() if ai_service.usar_batch else set()
+        if en_batch:
+            query = query.filter(Licitacion.id.notin_(en_batch))
+        
+        licitaciones = query.limit(limit).all()
         
         # Contar las que se saltan por presupuesto bajo
         skipped_low_budget = db.query(Licitacion).filter(
@@ -57,35 +89,44 @@ def analyze_pending_licitaciones(self, limit: int = 20):
         
         analizadas = 0
         errores = 0
+        ids_analizadas = []
         
-        ai_service = AIService()
+        analisis_batch = None
+        batch_id = None
+        if ai_service.usar_batch and licitaciones:
+            # Batch API: solo se envía el batch; collect_ai_batches guarda los resultados
+            # cuando termine (hasta 24h, muy por encima del límite de tiempo de la tarea)
+            peticiones = [
+                {
+                    'id': lic.id,
+                    'titulo': lic.titulo or '',
+                    'descripcion': lic.resumen or '',
+                    'texto_pliego': _texto_pliego(lic)
+                }
+                for lic in licitaciones
+            ]
+            envio = ai_service.enviar_batch(peticiones)
+            batch_id = envio['batch_id']
+            analisis_batch = envio['resultados']  # Solo las ya cacheadas
         
         for lic in licitaciones:
             try:
-                # Obtener texto del pliego si existe
-                texto_pliego = None
-                if lic.documentos:
-                    # Buscar documento principal (pliego técnico)
-                    for doc in lic.documentos:
-                        if doc.procesado and doc.texto_extraido:
-                            texto_pliego = doc.texto_extraido
-                            break
-                
-                # Analizar con IA
-                resultado = ai_service.analizar_licitacion_completa(
-                    titulo=lic.titulo or '',
-                    descripcion=lic.resumen or '',
-                    texto_pliego=texto_pliego
-                )
+                # Analizar con IA (resultado cacheado del batch o llamada en tiempo real)
+                if analisis_batch is not None:
+                    if lic.id not in analisis_batch:
+                        continue  # Enviada en el batch
+                    resultado = analisis_batch[lic.id]
+                else:
+                    resultado = ai_service.analizar_licitacion_completa(
+                        titulo=lic.titulo or '',
+                        descripcion=lic.resumen or '',
+                        texto_pliego=_texto_pliego(lic)
+                    )
                 
                 if resultado:
-                    # Guardar resultados del análisis
-                    lic.stack_tecnologico = json.dumps(resultado['stack_tecnologico'])
-                    lic.conceptos_tic = json.dumps(resultado['conceptos_tic'])
-                    lic.resumen_tecnico = json.dumps(resultado['resumen_tecnico'])
-                    lic.analizado_ia = True
-                    lic.fecha_analisis_ia = datetime.now()
+                    _guardar_analisis(lic, resultado)
                     analizadas += 1
+                    ids_analizadas.append(lic.id)
                     
                     logger.debug(f"Licitación analizada: {lic.expediente}")
                 else:
@@ -98,11 +139,14 @@ def analyze_pending_licitaciones(self, limit: int = 20):
                 continue
         
         db.commit()
+        invalidar_licitacion_detalle(*ids_analizadas)
         
         result = {
             'analizadas': analizadas,
             'errores': errores,
             'total': len(licitaciones),
+            'batch_id': batch_id,
+            'enviadas_batch': len(licitaciones) - len(analisis_batch) if batch_id else 0,
             'skipped_low_budget': skipped_low_budget,
             'min_budget_threshold': settings.MIN_BUDGET_FOR_AI_ANALYSIS,
             'timestamp': datetime.now().isoformat()
@@ -120,3 +164,138 @@ def analyze_pending_licitaciones(self, limit: int = 20):
     finally:
         db.close()
 
+
+
+@celery_app.task(base=DatabaseTask, bind=True, name="app.tasks.ai_tasks.collect_ai_batches")
+def collect_ai_batches(self):
+    """
+    Recoge los batches de IA terminados y guarda sus análisis
+    
+    Cada ejecución solo consulta el estado de los batches enviados por
+    analyze_pending_licitaciones; los que siguen en curso se revisan en la siguiente.
+    """
+    ai_service = AIService()
+    batches = ai_service.batches_en_curso()
+    
+    if not batches:
+        return {'recogidos': 0, 'analizadas': 0, 'errores': 0, 'timestamp': datetime.now().isoformat()}
+    
+    db = get_session_local()()
+    self._db = db
+    
+    recogidos = 0
+    analizadas = 0
+    errores = 0
+    
+    try:
+        for batch_id, registro in batches.items():
+            resultados = ai_service.recoger_batch(batch_id, registro)
+            if resultados is None:
+                continue  # Sigue en curso
+            
+            licitaciones = db.query(Licitacion).filter(
+                Licitacion.id.in_(list(resultados)),
+                Licitacion.analizado_ia == False
+            ).all()
+            
+            ids_analizadas = []
+            for lic in licitaciones:
+                resultado = resultados.get(lic.id)
+                if resultado:
+                    _guardar_analisis(lic, resultado)
+                    ids_analizadas.append(lic.id)
+                else:
+                    logger.error(f"Error analizando licitación {lic.id} en el batch {batch_id}")
+                    errores += 1
+            
+            db.commit()
+            invalidar_licitacion_detalle(*ids_analizadas)
+            # Solo tras el commit: si falla, el batch se vuelve a recoger (la salida ya está en caché)
+            ai_service.olvidar_batch(batch_id)
+            
+            recogidos += 1
+            analizadas += len(ids_analizadas)
+        
+        logger.info(f"Batches de IA recogidos: {recogidos}, {analizadas} licitaciones analizadas, {errores} errores")
+        
+        return {
+            'recogidos': recogidos,
+            'en_curso': len(batches) - recogidos,
+            'analizadas': analizadas,
+            'errores': errores,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    except Exception as e:
+        logger.error(f"Error recogiendo batches de IA: {e}")
+        db.rollback()
+        raise
+    
+    finally:
+        db.close()
+
+
+@celery_app.task(base=DatabaseTask, bind=True, name="app.tasks.ai_tasks.generar_titulos_adaptados_task")
+def generar_titulos_adaptados_task(self, batch_size: int = 100, desde_id: int = 0, max_lotes: int = 10):
+    """
+    Genera títulos adaptados para todas las licitaciones que no los tienen
+    
+    Cada ejecución procesa como mucho max_lotes lotes para terminar dentro del
+    límite de tiempo de Celery; si quedan pendientes se encola otra ejecución
+    que continúa desde el último id (su id se devuelve en siguiente_task_id).
+    El progreso se publica como estado PROGRESS para consultarlo desde
+    /admin/tasks/{task_id}.
+    
+    Args:
+        batch_size: Licitaciones por lote (un commit por lote)
+        desde_id: Continuar a partir de este id de licitación
+        max_lotes: Lotes por ejecución antes de encolar la siguiente
+    """
+    logger.info(f"Iniciando generación de títulos adaptados (lote: {batch_size}, desde id {desde_id})")
+    
+    db = get_session_local()()
+    self._db = db
+    
+    def publicar_progreso(procesadas: int, total: int):
+        self.update_state(state='PROGRESS', meta={'procesadas': procesadas, 'total': total})
+    
+    try:
+        service = TitulosAdaptadosService(db, batch_size=batch_size)
+        resultado = service.generar_pendientes(
+            progreso=publicar_progreso,
+            desde_id=desde_id,
+            max_lotes=max_lotes
+        )
+        
+        siguiente_task_id = None
+        if not resultado['completado']:
+            siguiente = generar_titulos_adaptados_task.delay(
+                batch_size=batch_size,
+                desde_id=resultado['ultimo_id'],
+                max_lotes=max_lotes
+            )
+            siguiente_task_id = siguiente.id
+            logger.info(f"Quedan títulos pendientes: continúa en la tarea {siguiente_task_id}")
+        
+        result = {
+            'total': resultado['total'],
+            'exitosas': resultado['exitosas'],
+            'fallidas': resultado['fallidas'],
+            'coste_estimado_usd': round(resultado['exitosas'] * 0.0001, 4),
+            'errores': resultado['errores'][:10],  # Máximo 10 errores
+            'ultimo_id': resultado['ultimo_id'],
+            'siguiente_task_id': siguiente_task_id,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        logger.info(f"Títulos adaptados: {resultado['exitosas']} generados, {resultado['fallidas']} fallidos")
+        
+        return result
+    
+    except Exception as e:
+        logger.error(f"Error generando títulos adaptados: {e}")
+        db.rollback()
+        raise
+    
+    finally:
+        db.close()
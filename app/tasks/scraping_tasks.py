@@ -3,7 +3,7 @@ Tareas de Celery para scraping de licitaciones
 """
 from celery import Task
 from app.core.celery_app import celery_app
-from app.core.database import SessionLocal
+from app.core.database import get_session_local
 from app.scrapers.placsp_scraper_v2 import PLACSPScraperV2
 from app.scrapers.gencat_scraper import GencatScraper
 from app.models.licitacion import Licitacion
@@ -12,6 +12,7 @@ from app.services.pdf_service import PDFService
 from app.services.ai_service import AIService
 from app.services.duplicate_detection_service import DuplicateDetectionService
 from datetime import datetime, timedelta
+from itertools import islice
 import logging
 
 logger = logging.getLogger(__name__)
@@ -55,19 +56,17 @@ def _procesar_licitacion_con_ia(licitacion: Licitacion, documentos: list, db):
             
             if analisis:
                 # Actualizar licitación con resultados del análisis
-                import json
-                
                 if analisis.get('titulo_adaptado'):
                     licitacion.titulo_adaptado = analisis['titulo_adaptado']
                 
                 if analisis.get('stack_tecnologico'):
-                    licitacion.stack_tecnologico = json.dumps(analisis['stack_tecnologico'])
+                    licitacion.stack_tecnologico = analisis['stack_tecnologico']
                 
                 if analisis.get('conceptos_tic'):
-                    licitacion.conceptos_tic = json.dumps(analisis['conceptos_tic'])
+                    licitacion.conceptos_tic = analisis['conceptos_tic']
                 
                 if analisis.get('resumen_tecnico'):
-                    licitacion.resumen_tecnico = json.dumps(analisis['resumen_tecnico'])
+                    licitacion.resumen_tecnico = analisis['resumen_tecnico']
                 
                 licitacion.analizado_ia = True
                 licitacion.fecha_analisis_ia = datetime.now()
@@ -104,7 +103,7 @@ def scrape_placsp_recent(self, days: int = 1):
     """
     logger.info(f"Iniciando scraping de PLACSP de los últimos {days} días")
     
-    db = SessionLocal()
+    db = get_session_local()()
     self._db = db
     
     try:
@@ -114,6 +113,11 @@ def scrape_placsp_recent(self, days: int = 1):
         # Scrape licitaciones recientes
         licitaciones = scraper.scrape_recent(days=days, filtrar_tic=True)
         
+        # Una sola query para saber cuáles ya existen
+        existentes = licitacion_service.get_by_ids_licitacion(
+            [lic_data.get('id_licitacion') for lic_data in licitaciones]
+        )
+        
         # Guardar en base de datos
         nuevas = 0
         actualizadas = 0
@@ -121,7 +125,7 @@ def scrape_placsp_recent(self, days: int = 1):
         for lic_data in licitaciones:
             try:
                 # Verificar si ya existe
-                existing = licitacion_service.get_by_id_licitacion(lic_data.get('id_licitacion'))
+                existing = existentes.get(lic_data.get('id_licitacion'))
                 
                 if existing:
                     # Actualizar si hay cambios
@@ -132,6 +136,7 @@ def scrape_placsp_recent(self, days: int = 1):
                 else:
                     # Crear nueva licitación
                     nueva_lic = licitacion_service.create(lic_data)
+                    existentes[nueva_lic.id_licitacion] = nueva_lic  # repetidas dentro del mismo lote
                     nuevas += 1
                     logger.debug(f"Nueva licitación: {lic_data.get('expediente')}")
                     
@@ -178,7 +183,7 @@ def scrape_placsp_full(self, max_pages: int = 100):
     """
     logger.info(f"Iniciando scraping completo de PLACSP (max {max_pages} páginas)")
     
-    db = SessionLocal()
+    db = get_session_local()()
     self._db = db
     
     try:
@@ -189,38 +194,49 @@ def scrape_placsp_full(self, max_pages: int = 100):
         actualizadas = 0
         total = 0
         
-        # Scrape todas las páginas
-        for lic_data in scraper.scrape_all(max_pages=max_pages, filtrar_tic=True):
-            total += 1
+        # Scrape todas las páginas, por bloques de 50: una query para saber cuáles
+        # ya existen y un commit por bloque
+        registros = scraper.scrape_all(max_pages=max_pages, filtrar_tic=True)
+        while True:
+            bloque = list(islice(registros, 50))
+            if not bloque:
+                break
             
-            try:
-                # Verificar si ya existe
-                existing = licitacion_service.get_by_id_licitacion(lic_data.get('id_licitacion'))
+            existentes = licitacion_service.get_by_ids_licitacion(
+                [lic_data.get('id_licitacion') for lic_data in bloque]
+            )
+            
+            for lic_data in bloque:
+                total += 1
                 
-                if existing:
-                    # Actualizar
-                    updated = licitacion_service.update(existing.id, lic_data)
-                    if updated:
-                        actualizadas += 1
-                else:
-                    # Crear nueva licitación
-                    nueva_lic = licitacion_service.create(lic_data)
-                    nuevas += 1
+                try:
+                    # Verificar si ya existe
+                    existing = existentes.get(lic_data.get('id_licitacion'))
                     
-                    # Procesar PDFs y analizar con IA si es nueva
-                    try:
-                        _procesar_licitacion_con_ia(nueva_lic, lic_data.get('documentos', []), db)
-                    except Exception as e:
-                        logger.error(f"Error procesando PDFs/IA para {lic_data.get('expediente')}: {e}")
+                    if existing:
+                        # Actualizar
+                        updated = licitacion_service.update(existing.id, lic_data)
+                        if updated:
+                            actualizadas += 1
+                    else:
+                        # Crear nueva licitación
+                        nueva_lic = licitacion_service.create(lic_data)
+                        existentes[nueva_lic.id_licitacion] = nueva_lic  # repetidas dentro del mismo bloque
+                        nuevas += 1
+                        
+                        # Procesar PDFs y analizar con IA si es nueva
+                        try:
+                            _procesar_licitacion_con_ia(nueva_lic, lic_data.get('documentos', []), db)
+                        except Exception as e:
+                            logger.error(f"Error procesando PDFs/IA para {lic_data.get('expediente')}: {e}")
                 
-                # Commit cada 50 licitaciones
-                if total % 50 == 0:
-                    db.commit()
-                    logger.info(f"Progreso: {total} licitaciones procesadas ({nuevas} nuevas, {actualizadas} actualizadas)")
+                except Exception as e:
+                    logger.error(f"Error procesando licitación {lic_data.get('expediente')}: {e}")
+                    continue
             
-            except Exception as e:
-                logger.error(f"Error procesando licitación {lic_data.get('expediente')}: {e}")
-                continue
+            # Commit cada 50 licitaciones
+            db.commit()
+            logger.info(f"Progreso: {total} licitaciones procesadas ({nuevas} nuevas, {actualizadas} actualizadas)")
         
         db.commit()
         
@@ -255,7 +271,7 @@ def cleanup_old_licitaciones(self, days: int = 365):
     """
     logger.info(f"Iniciando limpieza de licitaciones con más de {days} días")
     
-    db = SessionLocal()
+    db = get_session_local()()
     self._db = db
     
     try:
@@ -305,7 +321,7 @@ def scrape_gencat_recent(self, days: int = 1):
     """
     logger.info(f"Iniciando scraping de Gencat de los últimos {days} días")
     
-    db = SessionLocal()
+    db = get_session_local()()
     self._db = db
     
     try:
@@ -313,72 +329,83 @@ def scrape_gencat_recent(self, days: int = 1):
         licitacion_service = LicitacionService(db)
         duplicate_detector = DuplicateDetectionService()
         
-        # Scrape licitaciones recientes
+        # Scrape licitaciones recientes, por lotes
         fecha_desde = datetime.now() - timedelta(days=days)
-        licitaciones = list(scraper.scrape_all(
+        lotes = scraper.scrape_batches(
+            batch_size=200,
             fecha_desde=fecha_desde,
             max_results=1000,
             filtrar_tic=True
-        ))
+        )
         
         # Guardar en base de datos
+        total_scraped = 0
         nuevas = 0
         actualizadas = 0
         duplicadas_detectadas = 0
         
-        for lic_data in licitaciones:
-            try:
-                # Verificar si ya existe por ID
-                existing = licitacion_service.get_by_id_licitacion(lic_data.get('id_licitacion'))
-                
-                if existing:
-                    # Actualizar si hay cambios
-                    updated = licitacion_service.update(existing.id, lic_data)
-                    if updated:
-                        actualizadas += 1
-                        logger.debug(f"Actualizada licitación Gencat: {lic_data.get('expediente')}")
-                else:
-                    # Buscar posibles duplicados de otras fuentes
-                    posibles_duplicados = licitacion_service.buscar_posibles_duplicados(
-                        titulo=lic_data.get('titulo', ''),
-                        presupuesto=lic_data.get('presupuesto_base'),
-                        fecha_publicacion=lic_data.get('fecha_publicacion'),
-                        dias_margen=7
-                    )
+        for lote in lotes:
+            total_scraped += len(lote)
+            
+            # Una sola query para saber qué licitaciones del lote ya existen
+            existentes = licitacion_service.get_by_ids_licitacion(
+                [lic_data.get('id_licitacion') for lic_data in lote]
+            )
+            
+            for lic_data in lote:
+                try:
+                    # Verificar si ya existe por ID
+                    existing = existentes.get(lic_data.get('id_licitacion'))
                     
-                    es_duplicada = False
-                    for posible_dup in posibles_duplicados:
-                        # Convertir a dict para comparación
-                        dup_dict = {
-                            'id_licitacion': posible_dup.id_licitacion,
-                            'fuente': 'PLACSP',  # Asumimos que los existentes son de PLACSP
-                            'expediente': posible_dup.expediente,
-                            'titulo': posible_dup.titulo,
-                            'presupuesto_base': posible_dup.presupuesto_base,
-                            'fecha_publicacion': posible_dup.fecha_actualizacion
-                        }
+                    if existing:
+                        # Actualizar si hay cambios
+                        updated = licitacion_service.update(existing.id, lic_data)
+                        if updated:
+                            actualizadas += 1
+                            logger.debug(f"Actualizada licitación Gencat: {lic_data.get('expediente')}")
+                    else:
+                        # Buscar posibles duplicados de otras fuentes
+                        posibles_duplicados = licitacion_service.buscar_posibles_duplicados(
+                            titulo=lic_data.get('titulo', ''),
+                            presupuesto=lic_data.get('presupuesto_base'),
+                            fecha_publicacion=lic_data.get('fecha_publicacion'),
+                            dias_margen=7
+                        )
                         
-                        if duplicate_detector.son_duplicadas(lic_data, dup_dict):
-                            logger.info(f"Duplicado detectado: Gencat/{lic_data.get('expediente')} ya existe como {posible_dup.id_licitacion}")
-                            es_duplicada = True
-                            duplicadas_detectadas += 1
-                            break
-                    
-                    if not es_duplicada:
-                        # Crear nueva licitación
-                        nueva_lic = licitacion_service.create(lic_data)
-                        nuevas += 1
-                        logger.debug(f"Nueva licitación Gencat: {lic_data.get('expediente')}")
+                        es_duplicada = False
+                        for posible_dup in posibles_duplicados:
+                            # Convertir a dict para comparación
+                            dup_dict = {
+                                'id_licitacion': posible_dup.id_licitacion,
+                                'fuente': 'PLACSP',  # Asumimos que los existentes son de PLACSP
+                                'expediente': posible_dup.expediente,
+                                'titulo': posible_dup.titulo,
+                                'presupuesto_base': posible_dup.presupuesto_base,
+                                'fecha_publicacion': posible_dup.fecha_actualizacion
+                            }
+                            
+                            if duplicate_detector.son_duplicadas(lic_data, dup_dict):
+                                logger.info(f"Duplicado detectado: Gencat/{lic_data.get('expediente')} ya existe como {posible_dup.id_licitacion}")
+                                es_duplicada = True
+                                duplicadas_detectadas += 1
+                                break
+                        
+                        if not es_duplicada:
+                            # Crear nueva licitación
+                            nueva_lic = licitacion_service.create(lic_data)
+                            existentes[nueva_lic.id_licitacion] = nueva_lic  # repetidas dentro del mismo lote
+                            nuevas += 1
+                            logger.debug(f"Nueva licitación Gencat: {lic_data.get('expediente')}")
+                
+                except Exception as e:
+                    logger.error(f"Error procesando licitación Gencat {lic_data.get('expediente')}: {e}")
+                    continue
             
-            except Exception as e:
-                logger.error(f"Error procesando licitación Gencat {lic_data.get('expediente')}: {e}")
-                continue
-        
-        db.commit()
+            db.commit()
         
         result = {
             'fuente': 'GENCAT',
-            'total_scraped': len(licitaciones),
+            'total_scraped': total_scraped,
             'nuevas': nuevas,
             'actualizadas': actualizadas,
             'duplicadas': duplicadas_detectadas,
@@ -386,7 +413,7 @@ def scrape_gencat_recent(self, days: int = 1):
             'timestamp': datetime.now().isoformat()
         }
         
-        logger.info(f"Scraping Gencat completado: {nuevas} nuevas, {actualizadas} actualizadas de {len(licitaciones)} totales")
+        logger.info(f"Scraping Gencat completado: {nuevas} nuevas, {actualizadas} actualizadas de {total_scraped} totales")
         
         return result
     
@@ -0,0 +1,48 @@
+"""
+Tareas de Celery para estadísticas materializadas
+"""
+from celery import Task
+from app.core.celery_app import celery_app
+from app.core.database import get_session_local
+from app.services.estadisticas_service import EstadisticasService
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseTask(Task):
+    """Tarea base que gestiona la sesión de base de datos"""
+    _db = None
+
+    def after_return(self, *args, **kwargs):
+        if self._db is not None:
+            self._db.close()
+
+
+@celery_app.task(base=DatabaseTask, bind=True, name="app.tasks.stats_tasks.refresh_stats_snapshot")
+def refresh_stats_snapshot(self):
+    """
+    Recalcula las estadísticas generales y las guarda en stats_snapshot
+    """
+    logger.info("Refrescando snapshot de estadísticas")
+    
+    db = get_session_local()()
+    self._db = db
+    
+    try:
+        snapshot = EstadisticasService(db).refrescar_snapshot()
+        db.commit()
+        
+        return {
+            'total_licitaciones': snapshot.total_licitaciones,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    except Exception as e:
+        logger.error(f"Error refrescando snapshot de estadísticas: {e}")
+        db.rollback()
+        raise
+    
+    finally:
+        db.close()
@@ -8,9 +8,8 @@ import os
 import sys
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.models.licitacion import Licitacion
 from app.services.ai_service import AIService
-import time
+from app.services.titulos_adaptados_service import TitulosAdaptadosService
 
 # Configuración de la base de datos
 DATABASE_URL = os.getenv('DATABASE_URL')
@@ -30,48 +29,26 @@ def generar_titulos_adaptados():
     
     db = SessionLocal()
     try:
-        # Obtener licitaciones sin titulo_adaptado
-        licitaciones = db.query(Licitacion).filter(
-            (Licitacion.titulo_adaptado == None) | (Licitacion.titulo_adaptado == '')
-        ).all()
+        service = TitulosAdaptadosService(db, ai_service)
         
-        total = len(licitaciones)
-        print(f"📊 Encontradas {total} licitaciones sin título adaptado")
+        print(f"\n🤖 Generando títulos adaptados con IA...")
+        print("-" * 60)
+        
+        def mostrar_progreso(procesadas, total):
+            print(f"✅ [{procesadas}/{total}] lote guardado")
+        
+        resultado = service.generar_pendientes(progreso=mostrar_progreso)
+        
+        total = resultado['total']
+        exitosos = resultado['exitosas']
+        fallidos = resultado['fallidas']
         
         if total == 0:
             print("✅ Todas las licitaciones ya tienen título adaptado")
             return
         
-        print(f"\n🤖 Generando títulos adaptados con IA...")
-        print(f"⏱️  Tiempo estimado: ~{total * 2} segundos")
-        print("-" * 60)
-        
-        exitosos = 0
-        fallidos = 0
-        
-        for i, licitacion in enumerate(licitaciones, 1):
-            try:
-                # Generar título adaptado
-                titulo_adaptado = ai_service.generar_titulo_adaptado(
-                    licitacion.titulo,
-                    licitacion.descripcion
-                )
-                
-                # Actualizar en la base de datos
-                licitacion.titulo_adaptado = titulo_adaptado
-                db.commit()
-                
-                exitosos += 1
-                print(f"✅ [{i}/{total}] ID {licitacion.id}: {titulo_adaptado[:60]}...")
-                
-                # Pequeña pausa para no saturar la API de OpenAI
-                time.sleep(0.5)
-                
-            except Exception as e:
-                fallidos += 1
-                print(f"❌ [{i}/{total}] ID {licitacion.id}: Error - {str(e)}")
-                db.rollback()
-                continue
+        for error in resultado['errores']:
+            print(f"❌ ID {error['licitacion_id']}: Error - {error['error']}")
         
         print("-" * 60)
         print(f"\n📈 Resumen:")
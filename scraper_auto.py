@@ -107,11 +107,17 @@ def main():
             
             logger.info(f"✓ PLACSP: {len(licitaciones_placsp)} licitaciones encontradas")
             
+            licitaciones_placsp = [l.dict() if hasattr(l, 'dict') else l for l in licitaciones_placsp]
+            
+            # Una sola query para saber cuáles ya existen
+            existentes = licitacion_service.get_by_ids_licitacion(
+                [l.get("id_licitacion") for l in licitaciones_placsp]
+            )
+            
             # Procesar licitaciones de PLACSP
-            for lic_data_raw in licitaciones_placsp:
-                lic_data = lic_data_raw.dict() if hasattr(lic_data_raw, 'dict') else lic_data_raw
+            for lic_data in licitaciones_placsp:
                 try:
-                    existing = licitacion_service.get_by_id_licitacion(lic_data.get("id_licitacion"))
+                    existing = existentes.get(lic_data.get("id_licitacion"))
                     
                     if existing:
                         updated = licitacion_service.update(existing.id, lic_data)
@@ -119,6 +125,7 @@ def main():
                             total_actualizadas += 1
                     else:
                         nueva_lic = licitacion_service.create(lic_data)
+                        existentes[nueva_lic.id_licitacion] = nueva_lic  # repetidas dentro del mismo lote
                         total_nuevas += 1
                         
                         # Procesar PDFs y analizar con IA
@@ -142,19 +149,17 @@ def main():
                                     )
                                     
                                     if analisis:
-                                        import json
-                                        
                                         if analisis.get("titulo_adaptado"):
                                             nueva_lic.titulo_adaptado = analisis["titulo_adaptado"]
                                         
                                         if analisis.get("stack_tecnologico"):
-                                            nueva_lic.stack_tecnologico = json.dumps(analisis["stack_tecnologico"])
+                                            nueva_lic.stack_tecnologico = analisis["stack_tecnologico"]
                                         
                                         if analisis.get("conceptos_tic"):
-                                            nueva_lic.conceptos_tic = json.dumps(analisis["conceptos_tic"])
+                                            nueva_lic.conceptos_tic = analisis["conceptos_tic"]
                                         
                                         if analisis.get("resumen_tecnico"):
-                                            nueva_lic.resumen_tecnico = json.dumps(analisis["resumen_tecnico"])
+                                            nueva_lic.resumen_tecnico = analisis["resumen_tecnico"]
                                         
                                         nueva_lic.analizado_ia = True
                                         nueva_lic.fecha_analisis_ia = datetime.now()
@@ -192,11 +197,15 @@ def main():
             nuevas_gencat = 0
             actualizadas_gencat = 0
             
+            # Una sola query para saber cuáles ya existen
+            existentes = licitacion_service.get_by_ids_licitacion(
+                [l.get("id_licitacion") for l in licitaciones_gencat]
+            )
+            
             # Procesar licitaciones de Gencat
-            for lic_data_raw in licitaciones_gencat:
-                lic_data = lic_data_raw.dict() if hasattr(lic_data_raw, 'dict') else lic_data_raw
+            for lic_data in licitaciones_gencat:
                 try:
-                    existing = licitacion_service.get_by_id_licitacion(lic_data.get("id_licitacion"))
+                    existing = existentes.get(lic_data.get("id_licitacion"))
                     
                     if existing:
                         updated = licitacion_service.update(existing.id, lic_data)
@@ -205,6 +214,7 @@ def main():
                             total_actualizadas += 1
                     else:
                         nueva_lic = licitacion_service.create(lic_data)
+                        existentes[nueva_lic.id_licitacion] = nueva_lic  # repetidas dentro del mismo lote
                         nuevas_gencat += 1
                         total_nuevas += 1
                         
@@ -218,19 +228,17 @@ def main():
                             )
                             
                             if analisis:
-                                import json
-                                
                                 if analisis.get("titulo_adaptado"):
                                     nueva_lic.titulo_adaptado = analisis["titulo_adaptado"]
                                 
                                 if analisis.get("stack_tecnologico"):
-                                    nueva_lic.stack_tecnologico = json.dumps(analisis["stack_tecnologico"])
+                                    nueva_lic.stack_tecnologico = analisis["stack_tecnologico"]
                                 
                                 if analisis.get("conceptos_tic"):
-                                    nueva_lic.conceptos_tic = json.dumps(analisis["conceptos_tic"])
+                                    nueva_lic.conceptos_tic = analisis["conceptos_tic"]
                                 
                                 if analisis.get("resumen_tecnico"):
-                                    nueva_lic.resumen_tecnico = json.dumps(analisis["resumen_tecnico"])
+                                    nueva_lic.resumen_tecnico = analisis["resumen_tecnico"]
                                 
                                 nueva_lic.analizado_ia = True
                                 nueva_lic.fecha_analisis_ia = datetime.now()